@@ -26,9 +26,12 @@
 
 import os
 import hashlib
+import importlib
 import logging
+import stat
 import time
-from functools import reduce
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, reduce
 from typing import Any
 try:
     import requests
@@ -42,7 +45,6 @@ from pilot.common.exception import (
     SizeTooLarge,
     NoLocalSpace,
     ReplicasNotFound,
-    FileHandlingFailure,
 )
 from pilot.util.config import config
 from pilot.util.filehandling import (
@@ -55,6 +57,13 @@ from pilot.util.workernode import get_local_disk_space
 from pilot.util.auxiliary import TimeoutException
 from pilot.util.tracereport import TraceReport
 
+# md5 is only used for path construction, let FIPS enabled systems know about it (the argument requires Python 3.9)
+try:
+    hashlib.md5(usedforsecurity=False)
+    MD5_KWARGS = {'usedforsecurity': False}
+except TypeError:
+    MD5_KWARGS = {}
+
 
 class StagingClient:
     """Base Staging Client."""
@@ -62,16 +71,19 @@ class StagingClient:
     ipv = "IPv6"
     workdir = ''
     mode = ""  # stage-in/out, set by the inheritor of the class
-    copytool_modules = {'rucio': {'module_name': 'rucio'},
-                        'gfal': {'module_name': 'gfal'},
-                        'gfalcopy': {'module_name': 'gfal'},
-                        'xrdcp': {'module_name': 'xrdcp'},
-                        'mv': {'module_name': 'mv'},
-                        'objectstore': {'module_name': 'objectstore'},
-                        's3': {'module_name': 's3'},
-                        'gs': {'module_name': 'gs'},
-                        'lsm': {'module_name': 'lsm'}
+    # copytool module names by copytool name
+    copytool_modules = {'rucio': 'rucio',
+                        'gfal': 'gfal',
+                        'gfalcopy': 'gfal',
+                        'xrdcp': 'xrdcp',
+                        'mv': 'mv',
+                        'objectstore': 'objectstore',
+                        's3': 's3',
+                        'gs': 'gs',
+                        'lsm': 'lsm'
                         }
+    _copytool_cache = {}  # imported copytool modules by module name, see get_copytool_module()
+    _client_location_cache = {}  # detected client locations by use_vp value, see detect_client_location()
 
     # list of allowed schemas to be used for direct acccess mode from REMOTE replicas
     direct_remoteinput_allowed_schemas = ['root', 'https']
@@ -106,6 +118,7 @@ class StagingClient:
         self.infosys = infosys_instance or infosys
         self.ipv = ipv
         self.workdir = workdir
+        self._ddmconf = None  # cached storage data, see get_ddmconf()
 
         if isinstance(acopytools, str):
             acopytools = {'default': [acopytools]} if acopytools else {}
@@ -132,6 +145,20 @@ class StagingClient:
             raise PilotException("failed to resolve acopytools settings")
         logger.info('configured copytools per activity: acopytools=%s', self.acopytools)
 
+    def get_ddmconf(self) -> dict:
+        """
+        Get the full storage data (ddmconf) from infosys.
+
+        The result is cached per client instance, since infosys otherwise reloads all storage data on every call.
+        The cache is invalidated if infosys has been re-initialized (which replaces its storage cache object).
+
+        :return: dictionary of DDMEndpoint settings by DDMEndpoint name as a key (dict).
+        """
+        if self._ddmconf is None or self._ddmconf is not getattr(self.infosys, 'storages_info', None):
+            self._ddmconf = self.infosys.resolve_storage_data()
+
+        return self._ddmconf
+
     def allow_mvfinaldest(self, catchall: str):
         """
         Check if there is an override in catchall to allow mv to final destination.
@@ -143,10 +170,9 @@ class StagingClient:
 
     def set_acopytools(self):
         """Set the internal acopytools."""
-        if not self.acopytools:  # resolve from queuedata.acopytools using infosys
-            self.acopytools = (self.infosys.queuedata.acopytools or {}).copy()
-        if not self.acopytools:  # resolve from queuedata.copytools using infosys
-            self.acopytools = {"default": list((self.infosys.queuedata.copytools or {}).keys())}
+        if not self.acopytools:  # resolve from queuedata.acopytools, or else from queuedata.copytools, using infosys
+            queuedata = self.infosys.queuedata
+            self.acopytools = dict(queuedata.acopytools or {}) or {"default": list(queuedata.copytools or {})}
 
     @staticmethod
     def get_default_copytools(default_copytools: str):
@@ -170,13 +196,30 @@ class StagingClient:
         :param allowed_schemas: list of allowed schemas (list)
         :return: first matched replica or None if not found (Any or None).
         """
+        # a replica matches if it matches any of the schemas, so all prefixes can be tested with a single startswith() call
+        prefixes, any_schema = cls.get_schema_prefixes(tuple(allowed_schemas))
         for replica in replicas:
             pfn = replica.get('pfn')
-            for schema in allowed_schemas:
-                if pfn and (not schema or pfn.startswith(f'{schema}://')):
-                    return replica
+            if pfn and (any_schema or pfn.startswith(prefixes)):
+                return replica
         return None
 
+    @staticmethod
+    @lru_cache(maxsize=64)
+    def get_schema_prefixes(schemas: tuple) -> (tuple, bool):
+        """
+        Convert the given schemas to URL prefixes.
+
+        The result is cached since the same few schema lists (class attributes and queuedata settings) are used
+        for all files.
+
+        :param schemas: schema names, e.g. ('root', 'https') (tuple)
+        :return: URL prefixes, e.g. ('root://', 'https://') (tuple), True if an empty schema (any) is included (bool).
+        """
+        prefixes = tuple(f'{schema}://' for schema in schemas if schema)
+
+        return prefixes, len(prefixes) != len(schemas)
+
     def prepare_sources(self, files: list, activities: Any = None) -> None:
         """
         Prepare sources.
@@ -255,8 +298,10 @@ class StagingClient:
         for ddm in inputddms:
             xreplicas.extend(ddmreplicas.get(ddm) or [])
 
+        # the pfns are unique (keys of the Rucio pfns dictionary), so use them for the membership test
+        seen = {pfn for pfn, _ in xreplicas}
         for pfn, xdat in replicas:
-            if (pfn, xdat) in xreplicas:
+            if pfn in seen:
                 continue
             xreplicas.append((pfn, xdat))
 
@@ -289,7 +334,7 @@ class StagingClient:
         except Exception as exc:
             raise exc
 
-        files_lfn = dict(((e.scope, e.lfn), e) for e in xfiles)
+        files_lfn = {(e.scope, e.lfn): e for e in xfiles}
         for replica in replicas:
             k = replica['scope'], replica['name']
             fdat = files_lfn.get(k)
@@ -324,8 +369,10 @@ class StagingClient:
                 logger.info("filesize and checksum verification done")
                 self.trace_report.update(clientState="DONE")
 
-        logger.info('Number of resolved replicas:\n' +
-                    '\n'.join([f"lfn={f.lfn}: nr replicas={len(f.replicas or [])}, is_directaccess={f.is_directaccess(ensure_replica=False)}" for f in files]))
+        if logger.isEnabledFor(logging.INFO):
+            logger.info('Number of resolved replicas:\n%s',
+                        '\n'.join(f"lfn={f.lfn}: nr replicas={len(f.replicas or [])}, "
+                                  f"is_directaccess={f.is_directaccess(ensure_replica=False)}" for f in files))
 
         return files
 
@@ -385,13 +432,15 @@ class StagingClient:
         fdat.replicas = []  # reset replicas list
 
         # sort replicas by priority value
-        sorted_replicas = sorted(iter(list(replica.get('pfns', {}).items())), key=lambda x: x[1]['priority'])
+        sorted_replicas = sorted(replica.get('pfns', {}).items(), key=lambda x: x[1]['priority'])
 
         # prefer replicas from inputddms first
         #self.print_replicas(sorted_replicas)
         xreplicas = self.sort_replicas(sorted_replicas, fdat.inputddms)
         self.print_replicas(xreplicas)
 
+        inputddms = set(fdat.inputddms or [])
+
         for pfn, xdat in xreplicas:
 
             if xdat.get('type') != 'DISK':  # consider only DISK replicas
@@ -402,7 +451,7 @@ class StagingClient:
             ## (TEMPORARY?) consider fspec.inputddms as a primary source for local/lan source list definition
             ## backward compartible logic -- FIX ME LATER if NEED
             ## in case we should rely on domain value from Rucio, just remove the overwrite line below
-            rinfo['domain'] = 'lan' if rinfo['ddmendpoint'] in fdat.inputddms else 'wan'
+            rinfo['domain'] = 'lan' if rinfo['ddmendpoint'] in inputddms else 'wan'
 
             if not fdat.allow_lan and rinfo['domain'] == 'lan':
                 continue
@@ -420,16 +469,22 @@ class StagingClient:
 
         return fdat
 
-    def detect_client_location(self, use_vp: bool = False) -> dict:
+    def detect_client_location(self, use_vp: bool = False) -> (dict, str):
         """
         Detect the client location.
 
         Open a UDP socket to a machine on the internet, to get the local IPv4 and IPv6
         addresses of the requesting client.
 
+        The location does not change during the lifetime of the pilot, so successfully detected locations are
+        cached per process (and per use_vp value).
+
         :param use_vp: is it a VP site? (bool)
-        :return: client location (dict).
+        :return: client location (dict), diagnostics (str).
         """
+        if use_vp in StagingClient._client_location_cache:
+            return dict(StagingClient._client_location_cache[use_vp]), ''
+
         diagnostics = ''
         client_location = {}
 
@@ -480,6 +535,9 @@ class StagingClient:
                     self.logger.warning(diagnostics)
 
         self.logger.debug(f'will use client_location={client_location}')
+        if not diagnostics:
+            StagingClient._client_location_cache[use_vp] = dict(client_location)
+
         return client_location, diagnostics
 
     def resolve_surl(self, fspec: Any, protocol: dict, ddmconf: dict, **kwargs: dict) -> dict:
@@ -573,9 +631,9 @@ class StagingClient:
                     raise PilotException(f'passed unknown copytool with name={name} .. skipped',
                                          code=ErrorCodes.UNKNOWNCOPYTOOL)
 
-                module = self.copytool_modules[name]['module_name']
+                module = self.copytool_modules[name]
                 self.logger.info(f'trying to use copytool={name} for activity={activity}')
-                copytool = __import__(f'pilot.copytool.{module}', globals(), locals(), [module], 0)
+                copytool = self.get_copytool_module(module)
                 #self.trace_report.update(protocol=name)
 
             except PilotException as exc:
@@ -629,6 +687,24 @@ class StagingClient:
 
         return files
 
+    @classmethod
+    def get_copytool_module(cls, module: str) -> Any:
+        """
+        Import and return the given copytool module.
+
+        The imported modules are cached on the class, so the import machinery only runs once per copytool.
+
+        :param module: copytool module name, e.g. 'rucio' (str)
+        :raises: ImportError or any exception raised by the copytool module at import
+        :return: copytool module (Any).
+        """
+        copytool = cls._copytool_cache.get(module)
+        if copytool is None:
+            copytool = importlib.import_module(f'pilot.copytool.{module}')
+            cls._copytool_cache[module] = copytool
+
+        return copytool
+
     def require_protocols(self, files: list, copytool: Any, activity: list or str, local_dir: str = ''):
         """
         Require protocols.
@@ -654,7 +730,7 @@ class StagingClient:
         else:
             files = self.resolve_protocols(files)
 
-        ddmconf = self.infosys.resolve_storage_data()
+        ddmconf = self.get_ddmconf()
 
         for fspec in files:
 
@@ -691,7 +767,7 @@ class StagingClient:
         :param files: list of `FileSpec` objects (list)
         :return: list of `files` object (list).
         """
-        ddmconf = self.infosys.resolve_storage_data()
+        ddmconf = self.get_ddmconf()
 
         for fdat in files:
             ddm = ddmconf.get(fdat.ddmendpoint)
@@ -724,13 +800,18 @@ class StagingClient:
         if not fspec.protocols:
             return []
 
+        # group the protocols by endpoint schema in a single pass (keeping the protocol order within each group)
+        schema_protocols = {}
+        for pdat in fspec.protocols:
+            schema, sep, _ = pdat.get('endpoint', '').partition('://')
+            if sep:
+                schema_protocols.setdefault(schema, []).append(pdat)
+
         protocols = []
 
         allowed_schemas = allowed_schemas or [None]
         for schema in allowed_schemas:
-            for pdat in fspec.protocols:
-                if schema is None or pdat.get('endpoint', '').startswith(f"{schema}://"):
-                    protocols.append(pdat)
+            protocols.extend(fspec.protocols if schema is None else schema_protocols.get(schema, []))
 
         return protocols
 
@@ -862,18 +943,21 @@ class StageInClient(StagingClient):
                 allowed_schemas = ['root']
                 self.logger.debug('overwrote allowed_schemas for VP job: %s', str(allowed_schemas))
 
-            for fspec in files:
-                resolve_replica = getattr(copytool, 'resolve_replica', None)
-                resolve_replica = self.resolve_replica if not callable(resolve_replica) else resolve_replica
+            resolve_replica = getattr(copytool, 'resolve_replica', None)
+            resolve_replica = self.resolve_replica if not callable(resolve_replica) else resolve_replica
 
+            for fspec in files:
                 replica = None
 
+                # evaluate the direct access file pattern/access mode check only once per file (and only if needed)
+                is_directaccess = (fspec.direct_access_lan or fspec.direct_access_wan) and fspec.is_directaccess(ensure_replica=False)
+
                 # process direct access logic  ## TODO move to upper level, should not be dependent on copytool (anisyonk)
                 # check local replicas first
                 if fspec.allow_lan:
                     # prepare schemas which will be used to look up first the replicas allowed for direct access mode
                     primary_schemas = (self.direct_localinput_allowed_schemas if fspec.direct_access_lan and
-                                       fspec.is_directaccess(ensure_replica=False) else None)
+                                       is_directaccess else None)
                     replica = resolve_replica(fspec, primary_schemas, allowed_schemas, domain='lan')
                 else:
                     self.logger.info("[stage-in] LAN access is DISABLED for lfn=%s (fspec.allow_lan=%s)", fspec.lfn, fspec.allow_lan)
@@ -886,7 +970,7 @@ class StageInClient(StagingClient):
                 if not replica and fspec.allow_wan:
                     # prepare schemas which will be used to look up first the replicas allowed for direct access mode
                     primary_schemas = (self.direct_remoteinput_allowed_schemas if fspec.direct_access_wan and
-                                       fspec.is_directaccess(ensure_replica=False) else None)
+                                       is_directaccess else None)
                     xschemas = self.remoteinput_allowed_schemas
                     allowed_schemas = [schema for schema in allowed_schemas if schema in xschemas] if allowed_schemas else xschemas
                     replica = resolve_replica(fspec, primary_schemas, allowed_schemas, domain='wan')
@@ -934,7 +1018,7 @@ class StageInClient(StagingClient):
         if self.infosys:
             if self.infosys.queuedata:
                 kwargs['copytools'] = self.infosys.queuedata.copytools
-            kwargs['ddmconf'] = self.infosys.resolve_storage_data()
+            kwargs['ddmconf'] = self.get_ddmconf()
         kwargs['activity'] = activity
 
         # verify file sizes and available space for stage-in
@@ -965,6 +1049,8 @@ class StageInClient(StagingClient):
         :param files: list of FileSpec objects (list)
         :param workdir: work directory (str).
         """
+        debug = self.logger.isEnabledFor(logging.DEBUG)
+        n_direct_lan = n_direct_wan = 0
         for fspec in files:
             direct_lan = (fspec.domain == 'lan' and fspec.direct_access_lan and
                           fspec.is_directaccess(ensure_replica=True, allowed_replica_schemas=self.direct_localinput_allowed_schemas))
@@ -976,12 +1062,18 @@ class StageInClient(StagingClient):
             #    if '.root.' in fspec.lfn:
             #        direct_lan = True
 
-            if not direct_lan and not direct_wan:
-                self.logger.debug('direct lan/wan transfer will not be used for lfn=%s', fspec.lfn)
-            self.logger.debug('lfn=%s, direct_lan=%s, direct_wan=%s, direct_access_lan=%s, direct_access_wan=%s, '
-                              'direct_localinput_allowed_schemas=%s, remoteinput_allowed_schemas=%s, domain=%s',
-                              fspec.lfn, direct_lan, direct_wan, fspec.direct_access_lan, fspec.direct_access_wan,
-                              str(self.direct_localinput_allowed_schemas), str(self.direct_remoteinput_allowed_schemas), fspec.domain)
+            if debug:
+                if not direct_lan and not direct_wan:
+                    self.logger.debug('direct lan/wan transfer will not be used for lfn=%s', fspec.lfn)
+                self.logger.debug('lfn=%s, direct_lan=%s, direct_wan=%s, direct_access_lan=%s, direct_access_wan=%s, '
+                                  'direct_localinput_allowed_schemas=%s, remoteinput_allowed_schemas=%s, domain=%s',
+                                  fspec.lfn, direct_lan, direct_wan, fspec.direct_access_lan, fspec.direct_access_wan,
+                                  self.direct_localinput_allowed_schemas, self.direct_remoteinput_allowed_schemas, fspec.domain)
+
+            if direct_lan:
+                n_direct_lan += 1
+            elif direct_wan:
+                n_direct_wan += 1
 
             if direct_lan or direct_wan:
                 fspec.status_code = 0
@@ -1019,6 +1111,9 @@ class StageInClient(StagingClient):
                 else:
                     self.trace_report.send()
 
+        self.logger.info('direct access summary: %d/%d files will use direct access (lan=%d, wan=%d)',
+                         n_direct_lan + n_direct_wan, len(files), n_direct_lan, n_direct_wan)
+
     def check_availablespace(self, files: list):
         """
         Verify that enough local space is available to stage in and run the job.
@@ -1062,6 +1157,7 @@ class StageOutClient(StagingClient):
     """Stage-out client."""
 
     mode = "stage-out"
+    max_checksum_workers = 8  # maximum number of threads used for calculating output file checksums
 
     def prepare_destinations(self, files: list, activities: list or str) -> list:
         """
@@ -1129,15 +1225,29 @@ class StageOutClient(StagingClient):
         :param lfn: repliva LFN (str)
         :return: constructed path (str).
         """
-        s = f'{scope}:{lfn}'
-        hash_hex = hashlib.md5(s.encode('utf-8')).hexdigest()
+        # md5 is required here since it defines the Rucio deterministic path (it is not used for security)
+        scope_parts, scope_prefix = cls.get_scope_parts(scope)
+        hash_hex = hashlib.md5(scope_prefix + lfn.encode('utf-8'), **MD5_KWARGS).hexdigest()
 
         # exclude prefix from the path: this should be properly considered in protocol/AGIS for today
-        paths = scope.split('.') + [hash_hex[0:2], hash_hex[2:4], lfn]
+        paths = scope_parts + (hash_hex[0:2], hash_hex[2:4], lfn)
         paths = [_f for _f in paths if _f]  # remove empty parts to avoid double /-chars
 
         return '/'.join(paths)
 
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def get_scope_parts(scope: str) -> (tuple, bytes):
+        """
+        Split the scope into its path components and encode the '<scope>:' hash prefix.
+
+        The result is cached since most output files of a job share the same scope.
+
+        :param scope: replica scope (str)
+        :return: scope path components (tuple), encoded '<scope>:' prefix (bytes).
+        """
+        return tuple(scope.split('.')), f'{scope}:'.encode('utf-8')
+
     def resolve_surl(self, fspec: Any, protocol: dict, ddmconf: dict, **kwargs: dict) -> dict:
         """
         Resolve SURL.
@@ -1168,7 +1278,30 @@ class StageOutClient(StagingClient):
 
         return {'surl': surl}
 
-    def transfer_files(self, copytool: Any, files: list, activity: list, **kwargs: dict) -> list:
+    def calculate_checksums(self, files: list, algorithm: str):
+        """
+        Calculate the checksums for the given files and store them in fspec.checksum.
+
+        The checksums are calculated in parallel threads (the hashing functions release the GIL for large blocks).
+        In case of failures, the exception of the first failed file (in list order) is raised.
+
+        :param files: list of `FileSpec` objects with fspec.surl pointing to the local file (list)
+        :param algorithm: checksum algorithm (str)
+        :raise: FileHandlingFailure, NotImplementedError or Exception in case of failure.
+        """
+        if not files:
+            return
+
+        if len(files) == 1:
+            files[0].checksum[algorithm] = calculate_checksum(files[0].surl, algorithm=algorithm)
+            return
+
+        with ThreadPoolExecutor(max_workers=min(self.max_checksum_workers, len(files))) as executor:
+            futures = [executor.submit(calculate_checksum, fspec.surl, algorithm) for fspec in files]
+            for fspec, future in zip(files, futures):
+                fspec.checksum[algorithm] = future.result()
+
+    def transfer_files(self, copytool: Any, files: list, activity: list, **kwargs: dict) -> list:  # noqa: C901
         """
         Transfer files.
 
@@ -1183,6 +1316,7 @@ class StageOutClient(StagingClient):
         """
         # check if files exist before actual processing
         # populate filesize if needed, calculate checksum
+        checksum_files = []
         for fspec in files:
             if not fspec.ddmendpoint:  # ensure that output destination is properly set
                 if 'mv' not in self.infosys.queuedata.copytools:
@@ -1192,14 +1326,19 @@ class StageOutClient(StagingClient):
 
             pfn = fspec.surl or getattr(fspec, 'pfn', None) or os.path.join(kwargs.get('workdir', ''), fspec.lfn) or \
                 os.path.join(os.path.join(kwargs.get('workdir', ''), '..'), fspec.lfn)
-            if not os.path.exists(pfn) or not os.access(pfn, os.R_OK):
+            # stat the file only once, the result is used for the existence, size and file type checks below
+            try:
+                pfn_stat = os.stat(pfn)
+            except OSError:
+                pfn_stat = None
+            if not pfn_stat or not os.access(pfn, os.R_OK):
                 msg = f"output pfn file/directory does not exist: {pfn}"
                 self.logger.error(msg)
                 self.trace_report.update(clientState='MISSINGOUTPUTFILE', stateReason=msg, filename=fspec.lfn)
                 self.trace_report.send()
                 raise PilotException(msg, code=ErrorCodes.MISSINGOUTPUTFILE, state="FILE_INFO_FAIL")
             if not fspec.filesize:
-                fspec.filesize = os.path.getsize(pfn)
+                fspec.filesize = pfn_stat.st_size
 
             if not fspec.filesize:
                 msg = f'output file has size zero: {fspec.lfn}'
@@ -1208,14 +1347,13 @@ class StageOutClient(StagingClient):
 
             fspec.surl = pfn
             fspec.activity = activity
-            if os.path.isfile(pfn) and not fspec.checksum.get(config.File.checksum_type):
-                try:
-                    fspec.checksum[config.File.checksum_type] = calculate_checksum(pfn,
-                                                                                   algorithm=config.File.checksum_type)
-                except (FileHandlingFailure, NotImplementedError) as exc:
-                    raise exc
-                except Exception as exc:
-                    raise exc
+            if stat.S_ISREG(pfn_stat.st_mode) and not fspec.checksum.get(config.File.checksum_type):
+                checksum_files.append(fspec)
+
+        # copytools that support it calculate the checksum while reading the file for the upload
+        streaming_hash = getattr(copytool, 'supports_streaming_hash', False)
+        if not streaming_hash:
+            self.calculate_checksums(checksum_files, config.File.checksum_type)
 
         # prepare files (resolve protocol/transfer url)
         if getattr(copytool, 'require_protocols', True) and files:
@@ -1233,7 +1371,7 @@ class StageOutClient(StagingClient):
             kwargs['copytools'] = self.infosys.queuedata.copytools
 
             # some copytools will need to know endpoint specifics (e.g. the space token) stored in ddmconf, add it
-            kwargs['ddmconf'] = self.infosys.resolve_storage_data()
+            kwargs['ddmconf'] = self.get_ddmconf()
 
         if not files:
             msg = 'nothing to stage-out - an internal Pilot error has occurred'
@@ -1246,7 +1384,14 @@ class StageOutClient(StagingClient):
         # is there an override in catchall to allow mv to final destination (relevant for mv copytool only)
         kwargs['mvfinaldest'] = self.allow_mvfinaldest(kwargs.get('catchall', ''))
 
-        return copytool.copy_out(files, **kwargs)
+        files = copytool.copy_out(files, **kwargs)
+
+        # fall back to reading the files again for any checksum that could not be calculated during the transfer
+        if streaming_hash:
+            self.calculate_checksums([fspec for fspec in checksum_files if not fspec.checksum.get(config.File.checksum_type)],
+                                     config.File.checksum_type)
+
+        return files
 
 #class StageInClientAsync(object):
 #
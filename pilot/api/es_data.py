@@ -38,7 +38,7 @@ class StageInESClient(StageInClient):
         """Set default/init values."""
         super().__init__(**kwargs)
 
-        self.copytool_modules.setdefault('objectstore', {'module_name': 'objectstore'})
+        self.copytool_modules.setdefault('objectstore', 'objectstore')
         self.acopytools.setdefault('es_events_read', ['objectstore'])
 
     def prepare_sources(self, files: list, activities: Any = None):
@@ -77,5 +77,5 @@ class StageOutESClient(StageOutClient):
         """Set default/init values."""
         super().__init__(**kwargs)
 
-        self.copytool_modules.setdefault('objectstore', {'module_name': 'objectstore'})
+        self.copytool_modules.setdefault('objectstore', 'objectstore')
         self.acopytools.setdefault('es_events', ['objectstore'])
@@ -355,7 +355,12 @@ class ErrorCodes:
         :param errorcode: error code (int)
         :return: errormessage (str).
         """
-        return self._error_messages.get(errorcode, f"unknown error code: {errorcode}")
+        # note: the fallback message is only formatted for unknown codes (not on every call as with a get() default)
+        message = self._error_messages.get(errorcode)
+        if message is None:
+            message = f"unknown error code: {errorcode}"
+
+        return message
 
     def add_error_code(
         self, errorcode: int, priority: bool = False, msg: Any = None
@@ -22,10 +22,10 @@
 
 """Exceptions set by the pilot."""
 
-import time
 import threading
 import traceback
 from collections.abc import Callable
+from functools import partial
 from sys import exc_info
 from typing import Any
 
@@ -35,37 +35,35 @@ errors = ErrorCodes()
 
 
 class PilotException(Exception):
-    """Pilot exceptions class."""
+    """
+    Pilot exceptions class.
 
+    Subclasses only need to set the default_code class attribute to the corresponding error code. The error code
+    can be overridden per instance with the code keyword argument.
+    """
+
+    default_code = errors.UNKNOWNEXCEPTION
     _error_code = None
-    _message = None
 
     def __init__(self, *args, **kwargs):
         """Set default or initial values."""
-        super().__init__(args, kwargs)
-        self.args = args
+        super().__init__(*args)
         self.kwargs = kwargs
-        code = self.kwargs.get("code", None)
-        if code:
-            self._error_code = code
-        else:
-            self._error_code = errors.UNKNOWNEXCEPTION
-        self._message = errors.get_error_message(self._error_code)
+        self._error_code = kwargs.get("code") or self.default_code
+        self._error_header = None
         self._error_string = None
-        self._stack_trace = f"{traceback.format_exc()}"
+        # extract the stack of the exception being handled (if any) without keeping a reference to the traceback, its
+        # frames or their local variables; the stack trace is only formatted (and source lines read) on demand
+        _exc_info = exc_info()
+        self._traceback = traceback.TracebackException(*_exc_info, lookup_lines=False) if _exc_info[0] is not None else None
+        self._stack_trace = None if self._traceback else ""
 
     def __str__(self):
         """Set and return the error string for string representation of the class instance."""
-        try:
-            self._error_string = (
-                f"error code: {self._error_code}, message: {self._message % self.kwargs}"
-            )
-        except TypeError:
-            # at least get the core message out if something happened
-            self._error_string = (
-                f"error code: {self._error_code}, message: {self._message}"
-            )
+        if self._error_string is not None:  # the string is only built once (exceptions are often logged repeatedly)
+            return self._error_string
 
+        error_string = self._format_header()
         if len(self.args) > 0:
             # If there is a non-kwarg parameter, assume it's the error
             # message or reason description and tack it on to the end
@@ -75,22 +73,62 @@ class PilotException(Exception):
                 args = [f"{arg}" for arg in self.args if arg]
             except TypeError:
                 args = [f"{self.args}"]
-            self._error_string = self._error_string + "\ndetails: %s" % "\n".join(args)
-        return self._error_string.strip()
+            error_string += "\ndetails: " + "\n".join(args)
+
+        self._error_string = error_string.strip()
+        return self._error_string
 
     def get_detail(self):
         """Set and return the error string with the exception details."""
-        try:
-            self._error_string = (
-                f"error code: {self._error_code}, message: {self._message % self.kwargs}"
-            )
-        except TypeError:
-            # at least get the core message out if something happened
-            self._error_string = (
-                f"error code: {self._error_code}, message: {self._message}"
-            )
+        return self._format_header() + f"\nstacktrace: {self.stack_trace}"
+
+    def _format_header(self) -> str:
+        """
+        Return the error code and message part of the error string.
+
+        The header is shared by __str__() and get_detail() and is only formatted once.
+
+        :return: error header (str).
+        """
+        if self._error_header is None:
+            try:
+                self._error_header = f"error code: {self._error_code}, message: {self._message.format_map(self.kwargs)}"
+            except (KeyError, IndexError, ValueError):
+                # at least get the core message out if something happened
+                self._error_header = f"error code: {self._error_code}, message: {self._message}"
+
+        return self._error_header
+
+    @property
+    def stack_trace(self) -> str:
+        """
+        Return the stack trace of the exception that was being handled when this exception was created.
 
-        return self._error_string + f"\nstacktrace: {self._stack_trace}"
+        The stack trace is formatted on first access only, since most exceptions are caught without it being used.
+        It is empty if no exception was being handled.
+
+        :return: formatted stack trace (str).
+        """
+        if self._stack_trace is None:
+            self._stack_trace = "".join(self._traceback.format())
+            self._traceback = None
+
+        return self._stack_trace
+
+    @property
+    def _message(self) -> str:
+        """
+        Return the error message corresponding to the error code.
+
+        The message is looked up on demand, since many exceptions are caught without ever being converted to a string.
+
+        :return: error message (str).
+        """
+        return errors.get_error_message(self._error_code)
+
+    def __reduce__(self):
+        """Support pickling (the keyword arguments are not part of the args that are pickled by default)."""
+        return partial(self.__class__, **self.kwargs), self.args
 
     def get_error_code(self):
         """Return the error code."""
@@ -104,323 +142,195 @@ class PilotException(Exception):
 
 
 # class NotImplementedError(PilotException):
-#    """
-#    Not implemented exception.
-#    """
-#    def __init__(self, *args, **kwargs):
-#        super().__init__(args, kwargs)
-#        self._error_code = errors.NOTIMPLEMENTED
-#        self._message = errors.get_error_message(self._error_code)
+#    """Not implemented exception."""
+#
+#    default_code = errors.NOTIMPLEMENTED
 
 
 class UnknownException(PilotException):
     """Unknown exception."""
 
-    def __init__(self, *args, **kwargs):
-        """Set default and initial values."""
-        super().__init__(args, kwargs)
-        self._error_code = errors.UNKNOWNEXCEPTION
-        self._message = errors.get_error_message(self._error_code)
+    default_code = errors.UNKNOWNEXCEPTION
 
 
 class NoLocalSpace(PilotException):
     """Not enough local space."""
 
-    def __init__(self, *args, **kwargs):
-        """Set default and initial values."""
-        super().__init__(args, kwargs)
-        self._error_code = errors.NOLOCALSPACE
-        self._message = errors.get_error_message(self._error_code)
+    default_code = errors.NOLOCALSPACE
 
 
 class SizeTooLarge(PilotException):
     """Too large input files."""
 
-    def __init__(self, *args, **kwargs):
-        """Set default and initial values."""
-        super().__init__(args, kwargs)
-        self._error_code = errors.SIZETOOLARGE
-        self._message = errors.get_error_message(self._error_code)
+    default_code = errors.SIZETOOLARGE
 
 
 class StageInFailure(PilotException):
     """Failed to stage-in file."""
 
-    def __init__(self, *args, **kwargs):
-        """Set default and initial values."""
-        super().__init__(args, kwargs)
-        self._error_code = errors.STAGEINFAILED
-        self._message = errors.get_error_message(self._error_code)
+    default_code = errors.STAGEINFAILED
 
 
 class StageOutFailure(PilotException):
     """Failed to stage-out file."""
 
-    def __init__(self, *args, **kwargs):
-        """Set default and initial values."""
-        super().__init__(args, kwargs)
-        self._error_code = errors.STAGEOUTFAILED
-        self._message = errors.get_error_message(self._error_code)
+    default_code = errors.STAGEOUTFAILED
 
 
 class SetupFailure(PilotException):
     """Failed to setup environment."""
 
-    def __init__(self, *args, **kwargs):
-        """Set default and initial values."""
-        super().__init__(args, kwargs)
-        self._error_code = errors.SETUPFAILURE
-        self._message = errors.get_error_message(self._error_code)
+    default_code = errors.SETUPFAILURE
 
 
 class RunPayloadFailure(PilotException):
     """Failed to execute payload."""
 
-    def __init__(self, *args, **kwargs):
-        """Set default and initial values."""
-        super().__init__(args, kwargs)
-        self._error_code = errors.PAYLOADEXECUTIONFAILURE
-        self._message = errors.get_error_message(self._error_code)
+    default_code = errors.PAYLOADEXECUTIONFAILURE
 
 
 class MessageFailure(PilotException):
     """Failed to handle messages."""
 
-    def __init__(self, *args, **kwargs):
-        """Set default and initial values."""
-        super().__init__(args, kwargs)
-        self._error_code = errors.MESSAGEHANDLINGFAILURE
-        self._message = errors.get_error_message(self._error_code)
+    default_code = errors.MESSAGEHANDLINGFAILURE
 
 
 class CommunicationFailure(PilotException):
     """Failed to communicate with servers such as Panda, Harvester, ACT and so on."""
 
-    def __init__(self, *args, **kwargs):
-        """Set default and initial values."""
-        super().__init__(args, kwargs)
-        self._error_code = errors.COMMUNICATIONFAILURE
-        self._message = errors.get_error_message(self._error_code)
+    default_code = errors.COMMUNICATIONFAILURE
 
 
 class FileHandlingFailure(PilotException):
     """Failed during file handling."""
 
-    def __init__(self, *args, **kwargs):
-        """Set default and initial values."""
-        super().__init__(args, kwargs)
-        self._error_code = errors.FILEHANDLINGFAILURE
-        self._message = errors.get_error_message(self._error_code)
+    default_code = errors.FILEHANDLINGFAILURE
 
 
 class NoSuchFile(PilotException):
     """No such file or directory."""
 
-    def __init__(self, *args, **kwargs):
-        """Set default and initial values."""
-        super().__init__(args, kwargs)
-        self._error_code = errors.NOSUCHFILE
-        self._message = errors.get_error_message(self._error_code)
+    default_code = errors.NOSUCHFILE
 
 
 class ConversionFailure(PilotException):
     """Failed to convert object data."""
 
-    def __init__(self, *args, **kwargs):
-        """Set default and initial values."""
-        super().__init__(args, kwargs)
-        self._error_code = errors.CONVERSIONFAILURE
-        self._message = errors.get_error_message(self._error_code)
+    default_code = errors.CONVERSIONFAILURE
 
 
 class MKDirFailure(PilotException):
     """Failed to create local directory."""
 
-    def __init__(self, *args, **kwargs):
-        """Set default and initial values."""
-        super().__init__(args, kwargs)
-        self._error_code = errors.MKDIR
-        self._message = errors.get_error_message(self._error_code)
+    default_code = errors.MKDIR
 
 
 class NoGridProxy(PilotException):
     """Grid proxy not valid."""
 
-    def __init__(self, *args, **kwargs):
-        """Set default and initial values."""
-        super().__init__(args, kwargs)
-        self._error_code = errors.NOPROXY
-        self._message = errors.get_error_message(self._error_code)
+    default_code = errors.NOPROXY
 
 
 class NoVomsProxy(PilotException):
     """Voms proxy not valid."""
 
-    def __init__(self, *args, **kwargs):
-        """Set default and initial values."""
-        super().__init__(args, kwargs)
-        self._error_code = errors.NOVOMSPROXY
-        self._message = errors.get_error_message(self._error_code)
+    default_code = errors.NOVOMSPROXY
 
 
 class TrfDownloadFailure(PilotException):
     """Transform could not be downloaded."""
 
-    def __init__(self, *args, **kwargs):
-        """Set default and initial values."""
-        super().__init__(args, kwargs)
-        self._error_code = errors.TRFDOWNLOADFAILURE
-        self._message = errors.get_error_message(self._error_code)
+    default_code = errors.TRFDOWNLOADFAILURE
 
 
 class NotDefined(PilotException):
     """Not defined exception."""
 
-    def __init__(self, *args, **kwargs):
-        """Set default and initial values."""
-        super().__init__(args, kwargs)
-        self._error_code = errors.NOTDEFINED
-        self._message = errors.get_error_message(self._error_code)
+    default_code = errors.NOTDEFINED
 
 
 class NotSameLength(PilotException):
     """Not same length exception."""
 
-    def __init__(self, *args, **kwargs):
-        """Set default and initial values."""
-        super().__init__(args, kwargs)
-        self._error_code = errors.NOTSAMELENGTH
-        self._message = errors.get_error_message(self._error_code)
+    default_code = errors.NOTSAMELENGTH
 
 
 class ESRecoverable(PilotException):
     """Event service recoverable exception."""
 
-    def __init__(self, *args, **kwargs):
-        """Set default and initial values."""
-        super().__init__(args, kwargs)
-        self._error_code = errors.ESRECOVERABLE
-        self._message = errors.get_error_message(self._error_code)
+    default_code = errors.ESRECOVERABLE
 
 
 class ESFatal(PilotException):
     """Event service fatal exception."""
 
-    def __init__(self, *args, **kwargs):
-        """Set default and initial values."""
-        super().__init__(args, kwargs)
-        self._error_code = errors.ESFATAL
-        self._message = errors.get_error_message(self._error_code)
+    default_code = errors.ESFATAL
 
 
 class ExecutedCloneJob(PilotException):
     """Clone job executed exception."""
 
-    def __init__(self, *args, **kwargs):
-        """Set default and initial values."""
-        super().__init__(args, kwargs)
-        self._error_code = errors.EXECUTEDCLONEJOB
-        self._message = errors.get_error_message(self._error_code)
+    default_code = errors.EXECUTEDCLONEJOB
 
 
 class ESNoEvents(PilotException):
     """Event service no events exception."""
 
-    def __init__(self, *args, **kwargs):
-        """Set default and initial values."""
-        super().__init__(args, kwargs)
-        self._error_code = errors.ESNOEVENTS
-        self._message = errors.get_error_message(self._error_code)
+    default_code = errors.ESNOEVENTS
 
 
 class ExceededMaxWaitTime(PilotException):
     """Exceeded maximum waiting time (after abort_job has been set)."""
 
-    def __init__(self, *args, **kwargs):
-        """Set default and initial values."""
-        super().__init__(args, kwargs)
-        self._error_code = errors.EXCEEDEDMAXWAITTIME
-        self._message = errors.get_error_message(self._error_code)
+    default_code = errors.EXCEEDEDMAXWAITTIME
 
 
 class BadXML(PilotException):
     """Badly formed XML."""
 
-    def __init__(self, *args, **kwargs):
-        """Set default and initial values."""
-        super().__init__(args, kwargs)
-        self._error_code = errors.BADXML
-        self._message = errors.get_error_message(self._error_code)
+    default_code = errors.BADXML
 
 
 class NoSoftwareDir(PilotException):
     """Software applications directory does not exist."""
 
-    def __init__(self, *args, **kwargs):
-        """Set default and initial values."""
-        super().__init__(args, kwargs)
-        self._error_code = errors.NOSOFTWAREDIR
-        self._message = errors.get_error_message(self._error_code)
+    default_code = errors.NOSOFTWAREDIR
 
 
 class LogFileCreationFailure(PilotException):
     """Log file could not be created."""
 
-    def __init__(self, *args, **kwargs):
-        """Set default and initial values."""
-        super().__init__(args, kwargs)
-        self._error_code = errors.LOGFILECREATIONFAILURE
-        self._message = errors.get_error_message(self._error_code)
+    default_code = errors.LOGFILECREATIONFAILURE
 
 
 class QueuedataFailure(PilotException):
     """Failed to download queuedata."""
 
-    def __init__(self, *args, **kwargs):
-        """Set default and initial values."""
-        super().__init__(args, kwargs)
-        self._error_code = errors.QUEUEDATA
-        self._message = errors.get_error_message(self._error_code)
+    default_code = errors.QUEUEDATA
 
 
 class QueuedataNotOK(PilotException):
     """Queuedata is corrupt."""
 
-    def __init__(self, *args, **kwargs):
-        """Set default and initial values."""
-        super().__init__(args, kwargs)
-        self._error_code = errors.QUEUEDATANOTOK
-        self._message = errors.get_error_message(self._error_code)
+    default_code = errors.QUEUEDATANOTOK
 
 
 class ReplicasNotFound(PilotException):
     """No matching replicas were found in list_replicas() output."""
 
-    def __init__(self, *args, **kwargs):
-        """Set default and initial values."""
-        super().__init__(args, kwargs)
-        self._error_code = errors.NOREPLICAS
-        self._message = errors.get_error_message(self._error_code)
+    default_code = errors.NOREPLICAS
 
 
 class MiddlewareImportFailure(PilotException):
     """No matching replicas were found in list_replicas() output."""
 
-    def __init__(self, *args, **kwargs):
-        """Set default and initial values."""
-        super().__init__(args, kwargs)
-        self._error_code = errors.MIDDLEWAREIMPORTFAILURE
-        self._message = errors.get_error_message(self._error_code)
+    default_code = errors.MIDDLEWAREIMPORTFAILURE
 
 
 class JobAlreadyRunning(PilotException):
     """Clone job is already running elsewhere."""
 
-    def __init__(self, *args, **kwargs):
-        """Set default and initial values."""
-        super().__init__(args, kwargs)
-        self._error_code = errors.JOBALREADYRUNNING
-        self._message = errors.get_error_message(self._error_code)
+    default_code = errors.JOBALREADYRUNNING
 
     def __str__(self):
         """Return string for exception object."""
@@ -432,22 +342,26 @@ class ExcThread(threading.Thread):
     """Support class that allows for catching exceptions in threads."""
 
     def __init__(
-        self, bucket: Any, target: Callable, kwargs: dict[str, Any], name: str
+        self, bucket: Any, target: Callable, kwargs: dict[str, Any], name: str, event: threading.Event = None
     ):
         """
         Set data members.
 
         Init function with a bucket that can be used to communicate exceptions to the caller.
         The bucket is a Queue.queue() or queue.Queue() object that can hold an exception thrown by a thread.
+        The optional event is set when an exception has been placed in the bucket and when the thread finishes,
+        so that the caller can wait for it instead of polling the bucket.
 
         :param bucket: queue based bucket (Any)
         :param target: target function to execute (Callable)
         :param kwargs: target function options (dict)
-        :param name: name (str).
+        :param name: name (str)
+        :param event: event to set when there is news from the thread (threading.Event).
         """
         threading.Thread.__init__(self, target=target, kwargs=kwargs, name=name)
         self.name = name
         self.bucket = bucket
+        self.event = event
         self._target = target
         self._kwargs = kwargs
 
@@ -464,39 +378,28 @@ class ExcThread(threading.Thread):
         # pylint: disable=broad-except
         try:
             self._target(**self.kwargs)
-        except ValueError:
-            print(f"ValueError caught by thread run() function: {exc_info()}")
-            print(traceback.format_exc())
-            print(traceback.print_tb(exc_info()[2]))
-            self.bucket.put(exc_info())
-            print(
-                f"exception has been put in bucket queue belonging to thread '{self.name}'"
-            )
-            args = self._kwargs.get("args", None)
-            if args:
-                print(
-                    "setting graceful stop in 10 s since there is no point in continuing"
-                )
-                time.sleep(10)
-                args.graceful_stop.set()
         except Exception:
             # logger object can't be used here for some reason:
             # IOError: [Errno 2] No such file or directory: '/state/partition1/scratch/PanDA_Pilot2_*/pilotlog.txt'
             print(f"unexpected exception caught by thread run() function: {exc_info()}")
             print(traceback.format_exc())
-            print(traceback.print_tb(exc_info()[2]))
             self.bucket.put(exc_info())
+            if self.event:
+                self.event.set()
             print(
                 f"exception has been put in bucket queue belonging to thread '{self.name}'"
             )
             args = self._kwargs.get("args", None)
             if args:
-                # the sleep is needed to allow the threads to catch up
+                # the wait is needed to allow the threads to catch up (unless another thread already set graceful_stop)
                 print(
                     "setting graceful stop in 10 s since there is no point in continuing"
                 )
-                time.sleep(10)
+                args.graceful_stop.wait(timeout=10)
                 args.graceful_stop.set()
+        finally:
+            if self.event:
+                self.event.set()
 
     @property
     def kwargs(self) -> dict[str, Any]:
@@ -37,6 +37,8 @@ from pilot.util.filehandling import (
 
 logger = logging.getLogger(__name__)
 
+DETAILS_PATTERN = re.compile(r"[Dd]etails\s*:\s*(?P<error>.*)")  # error details in transfer command output
+
 
 def get_timeout(filesize: int, add: int = 0) -> int:
     """
@@ -175,7 +177,7 @@ def output_line_scan(ret: dict, output: str) -> dict:
     :return: updated error info dictionary (dict).
     """
     for line in output.split('\n'):
-        match = re.search(r"[Dd]etails\s*:\s*(?P<error>.*)", line)  # Python 3 (added r)
+        match = DETAILS_PATTERN.search(line)
         if match:
             ret['error'] = match.group('error')
         elif 'service_unavailable' in line:
@@ -27,7 +27,13 @@
 import errno
 import logging
 import os
+import shutil
+import tempfile
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from copy import copy
 from time import time
+from typing import Any
+from urllib.parse import urlparse
 
 from pilot.common.exception import (
     PilotException,
@@ -39,7 +45,8 @@ from pilot.util.container import execute
 #from pilot.util.timer import timeout
 from .common import (
     resolve_common_transfer_errors,
-    get_timeout
+    get_timeout,
+    verify_catalog_checksum
 )
 
 logger = logging.getLogger(__name__)
@@ -48,35 +55,37 @@ require_replicas = True  ## indicate if given copytool requires input replicas t
 
 allowed_schemas = ['srm', 'gsiftp', 'https', 'davs', 'root']  # prioritized list of supported schemas for transfers by given copytool
 
+GFAL_COPY_COMMAND = ('gfal-copy', '--verbose', '-f')  # base command used for all transfers
+gfal_available = False  # set by check_for_gfal() once gfal-copy has been found
+REQUIRED_ATTRIBUTES = ('lfn', 'turl')  # FileSpec attributes that must be set for all transfers
+TIMEOUT_ERRNOS = frozenset((errno.ETIMEDOUT, errno.ETIME))  # exit codes of timed out transfers
+TRACE_TIMEOUT = 300  # maximum time to wait for the trace reports of a copy_in/copy_out call
+# trace reports are sent in the background, one at a time (the curl fallback in send() uses fixed file names)
+trace_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='gfal_trace')
+
 
 def is_valid_for_copy_in(files: list) -> bool:
     """
     Determine if this copytool is valid for input for the given file list.
 
-    Placeholder.
+    All files must have an LFN and a transfer URL, so that malformed input is rejected before any gfal-copy call.
 
     :param files: list of FileSpec objects (list).
-    :return: always True (for now) (bool).
+    :return: True if all files can be transferred, False otherwise (bool).
     """
-    #for f in files:
-    #    if not all(key in f for key in ('name', 'source', 'destination')):
-    #        return False
-    return True  ## FIX ME LATER
+    return all(getattr(fspec, key, None) for fspec in files for key in REQUIRED_ATTRIBUTES)
 
 
 def is_valid_for_copy_out(files: list) -> bool:
     """
     Determine if this copytool is valid for output for the given file list.
 
-    Placeholder.
+    All files must have an LFN and a transfer URL, so that malformed input is rejected before any gfal-copy call.
 
     :param files: list of FileSpec objects (list).
-    :return: always True (for now) (bool).
+    :return: True if all files can be transferred, False otherwise (bool).
     """
-    # for f in files:
-    #    if not all(key in f for key in ('name', 'source', 'destination')):
-    #        return False
-    return True  ## FIX ME LATER
+    return all(getattr(fspec, key, None) for fspec in files for key in REQUIRED_ATTRIBUTES)
 
 
 def copy_in(files: list, **kwargs: dict) -> list:
@@ -89,6 +98,9 @@ def copy_in(files: list, **kwargs: dict) -> list:
     :return: updated files (list).
     """
     #allow_direct_access = kwargs.get('allow_direct_access') or False
+    if not files:
+        return files
+
     trace_report = kwargs.get('trace_report')
 
     if not check_for_gfal():
@@ -96,12 +108,21 @@ def copy_in(files: list, **kwargs: dict) -> list:
 
     # note, env vars might be unknown inside middleware contrainers, if so get the value already in the trace report
     localsite = os.environ.get('RUCIO_LOCAL_SITE_ID', trace_report.get_value('localSite'))
+
+    # first try to download files sharing a destination directory with a single gfal-copy call
+    # (files that could not be verified afterwards are transferred one by one below)
+    bulk_start = time()
+    bulk_files = copy_in_bulk(files, **kwargs) if len(files) > 1 else []
+
+    default_workdir = os.path.abspath(kwargs.get('workdir') or '.')  # loop invariant (abspath calls getcwd)
+    pending_traces = []  # trace reports being sent in the background
+
     for fspec in files:
         # update the trace report
         localsite = localsite if localsite else fspec.ddmendpoint
-        trace_report.update(localSite=localsite, remoteSite=fspec.ddmendpoint, filesize=fspec.filesize)
-        trace_report.update(filename=fspec.lfn, guid=fspec.guid.replace('-', ''))
-        trace_report.update(scope=fspec.scope, dataset=fspec.dataset)
+        trace_report.update(localSite=localsite, remoteSite=fspec.ddmendpoint, filesize=fspec.filesize,
+                            filename=fspec.lfn, guid=fspec.guid_nodash, scope=fspec.scope, dataset=fspec.dataset,
+                            catStart=bulk_start if fspec in bulk_files else time())
 
         # continue loop for files that are to be accessed directly   ## TO BE DEPRECATED (should be applied at top level) (anisyonk)
         #if fspec.is_directaccess(ensure_replica=False) and allow_direct_access and fspec.accessmode == 'direct':
@@ -111,25 +132,22 @@ def copy_in(files: list, **kwargs: dict) -> list:
         #    trace_report.send()
         #    continue
 
-        trace_report.update(catStart=time())
+        if fspec in bulk_files:
+            trace_report.update(url=fspec.turl, clientState='DONE', stateReason='OK', timeEnd=time())
+            pending_traces.append(send_trace(trace_report))
+            continue
 
-        dst = fspec.workdir or kwargs.get('workdir') or '.'
+        dst = os.path.abspath(fspec.workdir) if fspec.workdir else default_workdir
 
         timeout = get_timeout(fspec.filesize)
         source = fspec.turl
-        destination = f"file://{os.path.abspath(os.path.join(dst, fspec.lfn))}"
-
-        cmd = ['gfal-copy --verbose -f', f' -t {timeout}']
-
-        if fspec.checksum:
-            cmd += ['-K', '%s:%s' % list(fspec.checksum.items())[0]]
+        destination = f"file://{os.path.join(dst, fspec.lfn)}"
 
-        cmd += [source, destination]
-
-        rcode, stdout, stderr = execute(" ".join(cmd), **kwargs)
+        cmd = get_copy_command(source, destination, timeout, fspec.checksum_kv)
+        rcode, stdout, stderr = execute(cmd, shell=False, **kwargs)
 
         if rcode:  ## error occurred
-            if rcode in [errno.ETIMEDOUT, errno.ETIME]:
+            if rcode in TIMEOUT_ERRNOS:
                 error = {'rcode': ErrorCodes.STAGEINTIMEOUT,
                          'state': 'CP_TIMEOUT',
                          'error': f'Copy command timed out: {stderr}'}
@@ -139,6 +157,7 @@ def copy_in(files: list, **kwargs: dict) -> list:
             fspec.status_code = error.get('rcode')
             trace_report.update(clientState=error.get('state') or 'STAGEIN_ATTEMPT_FAILED',
                                 stateReason=error.get('error'), timeEnd=time())
+            wait_for_traces(pending_traces)
             trace_report.send()
 
             raise PilotException(error.get('error'), code=error.get('rcode'), state=error.get('state'))
@@ -146,11 +165,86 @@ def copy_in(files: list, **kwargs: dict) -> list:
         fspec.status_code = 0
         fspec.status = 'transferred'
         trace_report.update(clientState='DONE', stateReason='OK', timeEnd=time())
-        trace_report.send()
+        pending_traces.append(send_trace(trace_report))
+
+    wait_for_traces(pending_traces)
 
     return files
 
 
+def copy_in_bulk(files: list, **kwargs: dict) -> list:
+    """
+    Download the given files with a single gfal-copy call per destination directory.
+
+    The source URLs are passed to gfal-copy in a list file (--from-file). Since gfal-copy does not report the status
+    of each transfer in a parsable way, every file is verified locally afterwards (file size and catalog checksum).
+    Files that could not be verified are left untouched, so that the caller can transfer them one by one.
+
+    :param files: list of `FileSpec` objects (list)
+    :param kwargs: kwargs dictionary (dict)
+    :return: list of transferred files (list).
+    """
+    default_workdir = os.path.abspath(kwargs.get('workdir') or '.')
+    groups = {}
+    for fspec in files:
+        if is_valid_for_bulk(fspec):
+            dst = os.path.abspath(fspec.workdir) if fspec.workdir else default_workdir
+            groups.setdefault(dst, []).append(fspec)
+
+    transferred = []
+    for dst, group in groups.items():
+        if len(group) < 2:  # nothing to gain
+            continue
+
+        timeout = get_timeout(sum(fspec.filesize or 0 for fspec in group))
+        with tempfile.NamedTemporaryFile('w', dir=dst, prefix='gfal_sources_', suffix='.txt', delete=False) as _file:
+            _file.write(''.join(f'{fspec.turl}\n' for fspec in group))
+
+        cmd = [*GFAL_COPY_COMMAND, '-t', str(timeout), '--from-file', _file.name, f'file://{dst}/']
+        logger.info(f'bulk download of {len(group)} files to {dst}')
+        try:
+            rcode, _, stderr = execute(cmd, shell=False, **kwargs)
+        finally:
+            os.remove(_file.name)
+        if rcode:
+            logger.warning(f'bulk download returned exit code {rcode} (will verify files individually): {stderr}')
+
+        for fspec in group:
+            path = os.path.join(dst, fspec.lfn)
+            if not os.path.exists(path) or (fspec.filesize and os.path.getsize(path) != int(fspec.filesize)):
+                continue
+            state, _ = verify_catalog_checksum(fspec, path)
+            if state:  # reset the status set by verify_catalog_checksum(), the file will be downloaded again
+                fspec.status = None
+                fspec.status_code = 0
+                continue
+            fspec.status_code = 0
+            fspec.status = 'transferred'
+            transferred.append(fspec)
+
+    logger.info(f'{len(transferred)}/{len(files)} file(s) downloaded in bulk mode')
+
+    return transferred
+
+
+def is_valid_for_bulk(fspec: object) -> bool:
+    """
+    Determine if the given file can be downloaded in bulk mode.
+
+    In bulk mode gfal-copy names the local file after the last part of the source URL, so it must match the LFN.
+    A catalog checksum is also needed since the file is verified locally after the transfer.
+
+    :param fspec: FileSpec object (object)
+    :return: True if the file can be downloaded in bulk mode, False otherwise (bool).
+    """
+    if not fspec.turl or not fspec.checksum:
+        return False
+
+    url = urlparse(fspec.turl)
+
+    return not url.query and os.path.basename(url.path) == fspec.lfn
+
+
 def copy_out(files: list, **kwargs: dict) -> list:
     """
     Upload given files using gfal command.
@@ -160,33 +254,32 @@ def copy_out(files: list, **kwargs: dict) -> list:
     :return: updated files (list)
     :raises: PilotException in case of errors.
     """
+    if not files:
+        return files
+
     if not check_for_gfal():
         raise StageOutFailure("No GFAL2 tools found")
 
     trace_report = kwargs.get('trace_report')
+    default_workdir = os.path.abspath(kwargs.get('workdir') or '.')  # loop invariant (abspath calls getcwd)
+    pending_traces = []  # trace reports being sent in the background
 
     for fspec in files:
-        trace_report.update(scope=fspec.scope, dataset=fspec.dataset, url=fspec.surl, filesize=fspec.filesize)
-        trace_report.update(catStart=time(), filename=fspec.lfn, guid=fspec.guid.replace('-', ''))
+        trace_report.update(scope=fspec.scope, dataset=fspec.dataset, url=fspec.surl, filesize=fspec.filesize,
+                            catStart=time(), filename=fspec.lfn, guid=fspec.guid_nodash)
 
-        src = fspec.workdir or kwargs.get('workdir') or '.'
+        src = os.path.abspath(fspec.workdir) if fspec.workdir else default_workdir
 
         timeout = get_timeout(fspec.filesize)
 
-        source = f"file://{os.path.abspath(fspec.surl or os.path.join(src, fspec.lfn))}"
+        source = f"file://{os.path.abspath(fspec.surl) if fspec.surl else os.path.join(src, fspec.lfn)}"
         destination = fspec.turl
 
-        cmd = ['gfal-copy --verbose -f', f' -t {timeout}']
-
-        if fspec.checksum:
-            cmd += ['-K', '%s:%s' % list(fspec.checksum.items())[0]]  # Python 2/3
-
-        cmd += [source, destination]
-
-        rcode, stdout, stderr = execute(" ".join(cmd), **kwargs)
+        cmd = get_copy_command(source, destination, timeout, fspec.checksum_kv)
+        rcode, stdout, stderr = execute(cmd, shell=False, **kwargs)
 
         if rcode:  ## error occurred
-            if rcode in [errno.ETIMEDOUT, errno.ETIME]:
+            if rcode in TIMEOUT_ERRNOS:
                 error = {'rcode': ErrorCodes.STAGEOUTTIMEOUT,
                          'state': 'CP_TIMEOUT',
                          'error': f'Copy command timed out: {stderr}'}
@@ -197,17 +290,71 @@ def copy_out(files: list, **kwargs: dict) -> list:
             trace_report.update(clientState=error.get('state', None) or 'STAGEOUT_ATTEMPT_FAILED',
                                 stateReason=error.get('error', 'unknown error'),
                                 timeEnd=time())
+            wait_for_traces(pending_traces)
             trace_report.send()
             raise PilotException(error.get('error'), code=error.get('rcode'), state=error.get('state'))
 
         fspec.status_code = 0
         fspec.status = 'transferred'
         trace_report.update(clientState='DONE', stateReason='OK', timeEnd=time())
-        trace_report.send()
+        pending_traces.append(send_trace(trace_report))
+
+    wait_for_traces(pending_traces)
 
     return files
 
 
+def send_trace(trace_report: Any) -> Future:
+    """
+    Send a snapshot of the given trace report in the background.
+
+    The trace report object is reused for the next file, so a copy of its current state is sent.
+
+    :param trace_report: trace report object (Any)
+    :return: future of the send operation (Future).
+    """
+    return trace_executor.submit(copy(trace_report).send)
+
+
+def wait_for_traces(pending: list, timeout: int = TRACE_TIMEOUT):
+    """
+    Wait for the trace reports that are being sent in the background.
+
+    :param pending: list of futures returned by send_trace(), emptied by this function (list)
+    :param timeout: maximum time to wait in seconds (int).
+    """
+    if not pending:
+        return
+
+    done, not_done = wait(pending, timeout=timeout)
+    for future in done:
+        if future.exception():
+            logger.warning(f'failed to send trace report: {future.exception()}')
+    if not_done:
+        logger.warning(f'{len(not_done)} trace report(s) still being sent after {timeout} s')
+    pending.clear()
+
+
+def get_copy_command(source: str, destination: str, timeout: int, checksum: str) -> list:
+    """
+    Build the gfal-copy command for the given transfer.
+
+    :param source: source URL (str)
+    :param destination: destination URL (str)
+    :param timeout: transfer time-out in seconds (int)
+    :param checksum: checksum in the form 'type:value' used for verification, or empty string to skip it (str)
+    :return: command arguments (list).
+    """
+    cmd = [*GFAL_COPY_COMMAND, '-t', str(timeout)]
+
+    if checksum:
+        cmd += ['-K', checksum]
+
+    cmd += [source, destination]
+
+    return cmd
+
+
 def move_all_files_in(files: list, nretries: int = 1) -> (int, str, str):   ### NOT USED -- TO BE DEPRECATED
     """
     Move all input files.
@@ -231,7 +378,7 @@ def move_all_files_in(files: list, nretries: int = 1) -> (int, str, str):   ###
             exit_code, stdout, stderr = move(source, destination, entry.get('recursive', False))
 
             if exit_code != 0:
-                if ((exit_code not in (errno.ETIMEDOUT, errno.ETIME)) or ((retry + 1) == nretries)):
+                if ((exit_code not in TIMEOUT_ERRNOS) or ((retry + 1) == nretries)):
                     logger.warning(f"transfer failed: exit code = {exit_code}, stdout = {stdout}, stderr = {stderr}")
                     return exit_code, stdout, stderr
             else:  # all successful
@@ -263,7 +410,7 @@ def move_all_files_out(files: list, nretries: int = 1) -> (int, str, str):  ###
             exit_code, stdout, stderr = move(source, destination)
 
             if exit_code != 0:
-                if ((exit_code not in (errno.ETIMEDOUT, errno.ETIME)) or ((retry + 1) == nretries)):
+                if ((exit_code not in TIMEOUT_ERRNOS) or ((retry + 1) == nretries)):
                     logger.warning(f"transfer failed: exit code = {exit_code}, stdout = {stdout}, stderr = {stderr}")
                     return exit_code, stdout, stderr
             else:  # all successful
@@ -296,7 +443,14 @@ def check_for_gfal():
     """
     Check if gfal-copy is locally available.
 
+    A positive result is cached for the lifetime of the process. A negative result is not cached, since the PATH
+    might still be updated (e.g. by a later setup).
+
     :return: True if gfal-copy is available, False otherwise (bool).
     """
-    exit_code, _, _ = execute('which gfal-copy')
-    return exit_code == 0
+    global gfal_available  # pylint: disable=global-statement
+
+    if not gfal_available:
+        gfal_available = shutil.which('gfal-copy') is not None
+
+    return gfal_available
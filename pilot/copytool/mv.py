@@ -252,11 +252,13 @@ def move_all_files(files: list, copy_type: str, workdir: str, jobworkdir: str,
 
     pilot_user = os.environ.get('PILOT_USER', 'generic').lower()
     user = __import__(f'pilot.user.{pilot_user}.copytool_definitions', globals(), locals(), [pilot_user], 0)
+    # is the copytool allowed to move files to/from the final destination (not in Nordugrid/ATLAS)
+    final_destination = user.mv_to_final_destination() or mvfinaldest
     for fspec in files:  # entry = {'name':<filename>, 'source':<dir>, 'destination':<dir>}
 
         name = fspec.lfn
         if fspec.filetype == 'input':
-            if user.mv_to_final_destination() or mvfinaldest:
+            if final_destination:
                 subpath = user.get_path(fspec.scope, fspec.lfn)
                 logger.debug(f'subpath={subpath}')
                 source = os.path.join(workdir, subpath)
@@ -266,8 +268,7 @@ def move_all_files(files: list, copy_type: str, workdir: str, jobworkdir: str,
             destination = os.path.join(jobworkdir, name) if jobworkdir else os.path.join(workdir, name)
         else:
             source = os.path.join(workdir, name)
-            # is the copytool allowed to move files to the final destination (not in Nordugrid/ATLAS)
-            if user.mv_to_final_destination() or mvfinaldest:
+            if final_destination:
                 # create any sub dirs if they don't exist already, and find the final destination path
                 ec, diagnostics, destination = build_final_path(fspec.turl)
                 if ec:
@@ -23,12 +23,18 @@
 
 import logging
 import os
-from glob import glob
+import re
+import threading
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
 from typing import Any
 from urllib.parse import urlparse
 
 try:
     import boto3
+    from boto3.s3.transfer import TransferConfig
+    from botocore.config import Config
     from botocore.exceptions import ClientError
 except Exception:
     pass
@@ -37,6 +43,7 @@ from pilot.common.errorcodes import ErrorCodes
 from pilot.common.exception import PilotException
 from pilot.info import infosys
 from pilot.util.config import config
+from pilot.util.filehandling import ChecksumReader
 from pilot.util.ruciopath import get_rucio_path
 from .common import resolve_common_transfer_errors
 
@@ -46,9 +53,17 @@ errors = ErrorCodes()
 require_replicas = False          # indicates if given copytool requires input replicas to be resolved
 require_input_protocols = True    # indicates if given copytool requires input protocols and manual generation of input replicas
 require_protocols = True          # indicates if given copytool requires protocols to be resolved first for stage-out
+supports_streaming_hash = True    # indicates if given copytool calculates the output checksums while uploading
 
 allowed_schemas = ['srm', 'gsiftp', 'https', 'davs', 'root', 's3', 's3+rucio']
 
+MB = 1024 * 1024
+SLASHES_PATTERN = re.compile(r'/+')
+LOGFILE_PREFIXES = ('payload', 'memory_monitor', 'pilotlog')  # log files uploaded by copy_out_extend()
+
+s3_clients = {}  # S3 clients, reused for all transfers, keyed by (profile, endpoint)
+s3_clients_lock = threading.Lock()  # boto3 sessions are not thread safe (the clients are)
+
 
 def is_valid_for_copy_in(files: list) -> bool:
     """
@@ -102,22 +117,64 @@ def get_copy_out_extend() -> str:
     return os.environ.get("PANDA_PILOT_COPY_OUT_EXTEND", None)
 
 
+@lru_cache(maxsize=1)
+def get_transfer_config() -> Any:
+    """
+    Get the transfer configuration used for all downloads and uploads.
+
+    Large files are transferred in parts, using parallel byte-range requests. The number of parallel requests and the
+    part size (in MB) can be set with the PANDA_PILOT_S3_MAX_CONCURRENCY and PANDA_PILOT_S3_CHUNKSIZE environment
+    variables.
+
+    :return: transfer configuration (TransferConfig).
+    """
+    max_concurrency = int(os.environ.get("PANDA_PILOT_S3_MAX_CONCURRENCY", 16))
+    chunksize = int(os.environ.get("PANDA_PILOT_S3_CHUNKSIZE", 16)) * MB
+    logger.debug(f'using S3 transfer config with max_concurrency={max_concurrency}, multipart_chunksize={chunksize}')
+
+    return TransferConfig(multipart_threshold=8 * MB, multipart_chunksize=chunksize, max_concurrency=max_concurrency,
+                          io_chunksize=1 * MB, use_threads=True)
+
+
+def get_s3_client(endpoint: str) -> Any:
+    """
+    Get the S3 client for the given endpoint.
+
+    Creating a session and a client resolves the credentials and sets up a new connection pool, so the clients are
+    created only once and reused for all transfers to the same endpoint. The connection pool is sized to allow the
+    parallel requests of multipart transfers.
+
+    :param endpoint: endpoint URL (str)
+    :return: S3 client (botocore client).
+    """
+    profile = get_pilot_s3_profile()
+    with s3_clients_lock:
+        client = s3_clients.get((profile, endpoint))
+        if client is None:
+            logger.debug(f'creating S3 client for endpoint={endpoint} (profile={profile})')
+            session = boto3.Session(profile_name=profile)
+            client_config = Config(max_pool_connections=max(get_transfer_config().max_concurrency, 10),
+                                   retries={'max_attempts': 10, 'mode': 'standard'})
+            client = session.client('s3', endpoint_url=endpoint, config=client_config)
+            s3_clients[(profile, endpoint)] = client
+
+    return client
+
+
+@lru_cache(maxsize=1024)
 def get_endpoint_bucket_key(surl: str) -> (str, str, str):
     """
     Get the endpoint, bucket and key from the given SURL.
 
+    The result is cached, since the same SURL is parsed again when a transfer is retried.
+
     :param surl: SURL (str)
     :return: endpoint (str), bucket (str), key (str).
     """
     parsed = urlparse(surl)
-    endpoint = parsed.scheme + '://' + parsed.netloc
-    full_path = parsed.path
-    while "//" in full_path:
-        full_path = full_path.replace('//', '/')
-
-    parts = full_path.split('/')
-    bucket = parts[1]
-    key = '/'.join(parts[2:])
+    endpoint = f'{parsed.scheme}://{parsed.netloc}'
+    # collapse repeated slashes (e.g. 's3://host:443//bucket//key') before splitting off the bucket
+    bucket, _, key = SLASHES_PATTERN.sub('/', parsed.path).lstrip('/').partition('/')
 
     return endpoint, bucket, key
 
@@ -132,6 +189,7 @@ def resolve_surl(fspec: Any, protocol: dict, ddmconf: dict, **kwargs: dict) -> d
     :param protocol: suggested protocol (dict)
     :param ddmconf: full ddm storage data (dict)
     :param kwargs: kwargs dictionary (dict)
+    :raises: PilotException for unknown ddm endpoints, or if the dataset contains #{pandaid} and PANDAID is not set
     :return: SURL dictionary {'surl': surl} (dict).
     """
     if kwargs:  # to get rid of pylint warning
@@ -147,24 +205,20 @@ def resolve_surl(fspec: Any, protocol: dict, ddmconf: dict, **kwargs: dict) -> d
     if not ddm:
         raise PilotException(f'failed to resolve ddmendpoint by name={fspec.ddmendpoint}')
 
+    endpoint = protocol.get('endpoint', '')
+    path = protocol.get('path', '')
     if ddm.is_deterministic:
-        surl = protocol.get('endpoint', '') + os.path.join(protocol.get('path', ''), get_rucio_path(fspec.scope, fspec.lfn))
+        surl = endpoint + os.path.join(path, get_rucio_path(fspec.scope, fspec.lfn))
     elif ddm.type in {'OS_ES', 'OS_LOGS'}:
-        try:
-            pandaqueue = infosys.pandaqueue
-        except AttributeError:
-            pandaqueue = ""
-        if pandaqueue is None:
-            pandaqueue = ""
-
-        dataset = fspec.dataset
-        if dataset:
-            dataset = dataset.replace("#{pandaid}", os.environ['PANDAID'])
-        else:
-            dataset = ""
+        dataset = fspec.dataset or ""
+        if "#{pandaid}" in dataset:
+            pandaid = os.environ.get('PANDAID')
+            if not pandaid:
+                raise PilotException(f'resolve_surl(): PANDAID is not set, cannot resolve dataset={dataset} for ddm={fspec.ddmendpoint}')
+            dataset = dataset.replace("#{pandaid}", pandaid)
 
-        remote_path = os.path.join(protocol.get('path', ''), pandaqueue, dataset)
-        surl = protocol.get('endpoint', '') + remote_path
+        remote_path = os.path.join(path, pandaqueue, dataset)
+        surl = endpoint + remote_path
 
         fspec.protocol_id = protocol.get('id')
     else:
@@ -181,30 +235,68 @@ def copy_in(files: list, **kwargs: dict) -> list:
     """
     Download given files from an S3 bucket.
 
+    The files are downloaded in parallel (see run_transfers()).
+
     :param files: list of `FileSpec` objects (list)
     :param kwargs: kwargs dictionary (dict)
     :raises: PilotException in case of controlled error
     :return: updated list of files (list).
     """
-    for fspec in files:
+    run_transfers(partial(copy_in_file, workdir=kwargs.get('workdir')), files)
 
-        dst = fspec.workdir or kwargs.get('workdir') or '.'
+    return files
 
-        # bucket = 'bucket'  # UPDATE ME
-        path = os.path.join(dst, fspec.lfn)
-        logger.info(f'downloading surl {fspec.surl} to local file {path}')
-        status, diagnostics = download_file(path, fspec.surl)
 
-        if not status:  # an error occurred
-            error = resolve_common_transfer_errors(diagnostics, is_stagein=True)
-            fspec.status = 'failed'
-            fspec.status_code = error.get('rcode')
-            raise PilotException(error.get('error'), code=error.get('rcode'), state=error.get('state'))
+def copy_in_file(fspec: Any, workdir: str):
+    """
+    Download the given file from an S3 bucket.
 
-        fspec.status_code = 0
-        fspec.status = 'transferred'
+    :param fspec: FileSpec object (Any)
+    :param workdir: work directory (str)
+    :raises: PilotException in case of controlled error.
+    """
+    dst = fspec.workdir or workdir or '.'
 
-    return files
+    # bucket = 'bucket'  # UPDATE ME
+    path = os.path.join(dst, fspec.lfn)
+    logger.info(f'downloading surl {fspec.surl} to local file {path}')
+    status, diagnostics = download_file(path, fspec.surl)
+
+    if not status:  # an error occurred
+        error = resolve_common_transfer_errors(diagnostics, is_stagein=True)
+        fspec.status = 'failed'
+        fspec.status_code = error.get('rcode')
+        raise PilotException(error.get('error'), code=error.get('rcode'), state=error.get('state'))
+
+    fspec.status_code = 0
+    fspec.status = 'transferred'
+
+
+def run_transfers(transfer: Callable, items: list):
+    """
+    Run the given transfer function for all items in parallel.
+
+    All transfers are allowed to finish, also if one of them fails, so that a failure does not interrupt transfers
+    that are in progress. The number of parallel transfers can be set with the PANDA_PILOT_S3_FILE_CONCURRENCY
+    environment variable.
+
+    :param transfer: transfer function, called with a single item (Callable)
+    :param items: items to transfer, e.g. FileSpec objects (list)
+    :raises: the exception of the first failed transfer (after all transfers have finished).
+    """
+    if len(items) <= 1:
+        for item in items:
+            transfer(item)
+        return
+
+    max_workers = min(len(items), int(os.environ.get("PANDA_PILOT_S3_FILE_CONCURRENCY", 8)))
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='s3_transfer') as executor:
+        futures = [executor.submit(transfer, item) for item in items]
+
+    exceptions = [future.exception() for future in futures if future.exception()]
+    if exceptions:
+        logger.warning(f'{len(exceptions)}/{len(items)} transfer(s) failed: {[str(exc) for exc in exceptions]}')
+        raise exceptions[0]
 
 
 def download_file(path: str, surl: str, object_name: str = None) -> (bool, str):
@@ -218,10 +310,8 @@ def download_file(path: str, surl: str, object_name: str = None) -> (bool, str):
     """
     try:
         endpoint, bucket, object_name = get_endpoint_bucket_key(surl)
-        session = boto3.Session(profile_name=get_pilot_s3_profile())
-        # s3 = boto3.client('s3')
-        s3 = session.client('s3', endpoint_url=endpoint)
-        s3.download_file(bucket, object_name, path)
+        s3 = get_s3_client(endpoint)
+        s3.download_file(bucket, object_name, path, Config=get_transfer_config())
     except ClientError as error:
         diagnostics = f'S3 ClientError: {error}'
         logger.critical(diagnostics)
@@ -238,6 +328,9 @@ def copy_out_extend(files: list, **kwargs: dict) -> list:
     """
     Upload given files to S3 storage.
 
+    The log files of a file are uploaded in parallel (see run_transfers()). A failed log file upload does not stop
+    the others; once all uploads have finished, the exception of the first failed upload is raised.
+
     :param files: list of `FileSpec` objects (list)
     :param kwargs: kwargs dictionary (dict)
     :raises: PilotException in case of controlled error
@@ -254,35 +347,15 @@ def copy_out_extend(files: list, **kwargs: dict) -> list:
         lfn = fspec.lfn.strip()
         if lfn == '/' or lfn.endswith("log.tgz"):
             # ["pilotlog.txt", "payload.stdout", "payload.stderr"]:
-            logfiles += glob(workdir + '/payload*.*')
-            logfiles += glob(workdir + '/memory_monitor*.*')
+            logfiles = get_logfiles(workdir)
             # if lfn.find('/') < 0:
             #     lfn_path = os.path.join(workdir, lfn)
             #    if os.path.exists(lfn_path) and lfn_path not in logfiles:
             #        logfiles += [lfn_path]
-            logfiles += glob(workdir + '/pilotlog*.*')
         else:
             logfiles = [os.path.join(workdir, lfn)]
 
-        for path in logfiles:
-            logfile = os.path.basename(path)
-            if os.path.exists(path):
-                full_url = os.path.join(fspec.turl, logfile)
-                logger.info(f'uploading {path} to {full_url}')
-                status, diagnostics = upload_file(path, full_url)
-
-                if not status:  # an error occurred
-                    # create new error code(s) in ErrorCodes.py and set it/them in resolve_common_transfer_errors()
-                    error = resolve_common_transfer_errors(diagnostics, is_stagein=False)
-                    fspec.status = 'failed'
-                    fspec.status_code = error.get('rcode')
-                    raise PilotException(error.get('error'), code=error.get('rcode'), state=error.get('state'))
-            else:
-                diagnostics = f'local output file does not exist: {path}'
-                logger.warning(diagnostics)
-                fspec.status = 'failed'
-                fspec.status_code = errors.STAGEOUTFAILED
-                # raise PilotException(diagnostics, code=fspec.status_code, state=fspec.status)
+        run_transfers(partial(upload_logfile, fspec), logfiles)
 
         if fspec.status is None:
             fspec.status = 'transferred'
@@ -291,10 +364,64 @@ def copy_out_extend(files: list, **kwargs: dict) -> list:
     return files
 
 
+def get_logfiles(workdir: str) -> list:
+    """
+    Get the log files in the given work directory.
+
+    The log files are the files matching payload*.*, memory_monitor*.* or pilotlog*.*. The directory is only listed
+    once (instead of once per pattern).
+
+    :param workdir: work directory (str)
+    :return: paths to the log files (list).
+    """
+    logfiles = []
+    with os.scandir(workdir) as entries:
+        for entry in entries:
+            for prefix in LOGFILE_PREFIXES:
+                if entry.name.startswith(prefix) and '.' in entry.name[len(prefix):] and entry.is_file():
+                    logfiles.append(entry.path)
+                    break
+
+    return logfiles
+
+
+def upload_logfile(fspec: Any, path: str):
+    """
+    Upload the given log file to the location of the given file.
+
+    A missing local file is only logged and reflected in the file status. A failed upload also raises an exception,
+    which run_transfers() holds back until the uploads of the other log files (e.g. the pilot log) have finished.
+
+    :param fspec: FileSpec object (Any)
+    :param path: path to the log file (str)
+    :raises: PilotException in case the upload failed.
+    """
+    logfile = os.path.basename(path)
+    if os.path.exists(path):
+        full_url = f"{fspec.turl.rstrip('/')}/{logfile}"
+        logger.info(f'uploading {path} to {full_url}')
+        status, diagnostics, _ = upload_file(path, full_url)
+
+        if not status:  # an error occurred
+            # create new error code(s) in ErrorCodes.py and set it/them in resolve_common_transfer_errors()
+            error = resolve_common_transfer_errors(diagnostics, is_stagein=False)
+            logger.warning(f'failed to upload {path}: {error.get("error")}')
+            fspec.status = 'failed'
+            fspec.status_code = error.get('rcode')
+            raise PilotException(error.get('error'), code=error.get('rcode'), state=error.get('state'))
+    else:
+        diagnostics = f'local output file does not exist: {path}'
+        logger.warning(diagnostics)
+        fspec.status = 'failed'
+        fspec.status_code = errors.STAGEOUTFAILED
+
+
 def copy_out(files: list, **kwargs: dict) -> list:
     """
     Upload given files to S3 storage.
 
+    The files are uploaded in parallel (see run_transfers()).
+
     :param files: list of `FileSpec` objects (list)
     :param kwargs: kwargs dictionary (dict)
     :raise: PilotException in case of controlled error
@@ -304,61 +431,84 @@ def copy_out(files: list, **kwargs: dict) -> list:
         return copy_out_extend(files, **kwargs)
 
     workdir = kwargs.pop('workdir')
+    run_transfers(partial(copy_out_file, workdir=workdir), files)
 
-    for fspec in files:
+    return files
 
-        path = os.path.join(workdir, fspec.lfn)
-        if os.path.exists(path):
-            # bucket = 'bucket'  # UPDATE ME
-            logger.info(f'uploading {path} to {fspec.turl}')
-            full_url = os.path.join(fspec.turl, fspec.lfn)
-            status, diagnostics = upload_file(path, full_url)
-
-            if not status:  # an error occurred
-                # create new error code(s) in ErrorCodes.py and set it/them in resolve_common_transfer_errors()
-                error = resolve_common_transfer_errors(diagnostics, is_stagein=False)
-                fspec.status = 'failed'
-                fspec.status_code = error.get('rcode')
-                raise PilotException(error.get('error'), code=error.get('rcode'), state=error.get('state'))
-        else:
-            diagnostics = f'local output file does not exist: {path}'
-            logger.warning(diagnostics)
-            fspec.status = 'failed'
-            fspec.status_code = errors.STAGEOUTFAILED
-            raise PilotException(diagnostics, code=fspec.status_code, state=fspec.status)
 
-        fspec.status = 'transferred'
-        fspec.status_code = 0
+def copy_out_file(fspec: Any, workdir: str):
+    """
+    Upload the given file to S3 storage.
 
-    return files
+    :param fspec: FileSpec object (Any)
+    :param workdir: work directory (str)
+    :raise: PilotException in case of controlled error.
+    """
+    path = os.path.join(workdir, fspec.lfn)
+    if os.path.exists(path):
+        # bucket = 'bucket'  # UPDATE ME
+        logger.info(f'uploading {path} to {fspec.turl}')
+        full_url = f"{fspec.turl.rstrip('/')}/{fspec.lfn}"
+        # calculate the checksum during the upload if it is not known yet
+        checksum_type = config.File.checksum_type if not fspec.checksum.get(config.File.checksum_type) else ''
+        status, diagnostics, checksum = upload_file(path, full_url, checksum_type=checksum_type)
+        if checksum:
+            fspec.checksum[checksum_type] = checksum
+
+        if not status:  # an error occurred
+            # create new error code(s) in ErrorCodes.py and set it/them in resolve_common_transfer_errors()
+            error = resolve_common_transfer_errors(diagnostics, is_stagein=False)
+            fspec.status = 'failed'
+            fspec.status_code = error.get('rcode')
+            raise PilotException(error.get('error'), code=error.get('rcode'), state=error.get('state'))
+    else:
+        diagnostics = f'local output file does not exist: {path}'
+        logger.warning(diagnostics)
+        fspec.status = 'failed'
+        fspec.status_code = errors.STAGEOUTFAILED
+        raise PilotException(diagnostics, code=fspec.status_code, state=fspec.status)
+
+    fspec.status = 'transferred'
+    fspec.status_code = 0
 
 
-def upload_file(file_name: str, full_url: str) -> (bool, str):
+def upload_file(file_name: str, full_url: str, checksum_type: str = '') -> (bool, str, str):
     """
     Upload a file to an S3 bucket.
 
+    If checksum_type is set, the checksum is calculated from the data read during the upload, so that
+    the file does not have to be read twice.
+
     :param file_name: file to upload (str)
     :param full_url: full URL to upload to (str)
-    :return: True if file was uploaded - otherwise False (bool), diagnostics (str).
+    :param checksum_type: checksum algorithm to calculate during the upload, if any (str)
+    :return: True if file was uploaded - otherwise False (bool), diagnostics (str), checksum (str).
     """
+    checksum = ''
+
     # upload the file
     try:
         # s3_client = boto3.client('s3')
         endpoint, bucket, object_name = get_endpoint_bucket_key(full_url)
-        session = boto3.Session(profile_name=get_pilot_s3_profile())
-        s3_client = session.client('s3', endpoint_url=endpoint)
+        s3_client = get_s3_client(endpoint)
         # response = s3_client.upload_file(file_name, bucket, object_name)
-        s3_client.upload_file(file_name, bucket, object_name)
+        if checksum_type:
+            with open(file_name, 'rb') as _file:
+                reader = ChecksumReader(_file, algorithm=checksum_type)
+                s3_client.upload_fileobj(reader, bucket, object_name, Config=get_transfer_config())
+                checksum = reader.get_checksum(os.fstat(_file.fileno()).st_size)
+        else:
+            s3_client.upload_file(file_name, bucket, object_name, Config=get_transfer_config())
         if object_name.endswith(config.Pilot.pilotlog):
             os.environ['GTAG'] = full_url
             logger.debug(f"Set envvar GTAG with the pilotLot URL={full_url}")
     except ClientError as error:
         diagnostics = f'S3 ClientError: {error}'
         logger.critical(diagnostics)
-        return False, diagnostics
+        return False, diagnostics, checksum
     except Exception as error:
         diagnostics = f'exception caught in s3_client: {error}'
         logger.critical(diagnostics)
-        return False, diagnostics
+        return False, diagnostics, checksum
 
-    return True, ""
+    return True, "", checksum
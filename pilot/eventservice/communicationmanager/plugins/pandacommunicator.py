@@ -25,6 +25,7 @@
 import logging
 import threading
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from os import environ
 from typing import Any
 
@@ -36,6 +37,12 @@ from .basecommunicator import BaseCommunicator
 
 logger = logging.getLogger(__name__)
 
+MAX_UPDATE_WORKERS = 8  # maximum number of job updates sent in parallel
+# getJob data keys and the corresponding request attributes
+GET_JOBS_KMAP = (('node', 'node'), ('mem', 'mem'), ('getProxyKey', 'getProxyKey'), ('computingElement', 'queue'),
+                 ('diskSpace', 'disk_space'), ('siteName', 'site'), ('prodSourceLabel', 'job_label'),
+                 ('workingGroup', 'working_group'), ('cpu', 'cpu'))
+
 
 class PandaCommunicator(BaseCommunicator):
     """PanDA communicator class."""
@@ -51,7 +58,6 @@ class PandaCommunicator(BaseCommunicator):
         self.get_jobs_lock = threading.Lock()
         self.get_events_lock = threading.Lock()
         self.update_events_lock = threading.Lock()
-        self.update_jobs_lock = threading.Lock()
 
     def pre_check_get_jobs(self, req: Any = None) -> Any:
         """
@@ -88,10 +94,7 @@ class PandaCommunicator(BaseCommunicator):
         :return: data dictionary (dict).
         """
         data = {'getProxyKey': 'False'}
-        kmap = {'node': 'node', 'mem': 'mem', 'getProxyKey': 'getProxyKey', 'computingElement': 'queue',
-                'diskSpace': 'disk_space',
-                'siteName': 'site', 'prodSourceLabel': 'job_label', 'workingGroup': 'working_group', 'cpu': 'cpu'}
-        for key, value in list(kmap.items()):
+        for key, value in GET_JOBS_KMAP:
             if hasattr(req, value):
                 data[key] = getattr(req, value)
 
@@ -104,48 +107,47 @@ class PandaCommunicator(BaseCommunicator):
         :param req: request (Any)
         :return: job definition dictionary (dict).
         """
-        self.get_jobs_lock.acquire()
-
-        try:
-            jobs = []
-            resp_attrs = None
-
-            # get the data dictionary
-            data = self.get_data(req)
-
-            for _ in range(req.num_jobs):
-                logger.info(f"Getting jobs: {data}")
-                url = environ.get('PANDA_SERVER_URL', config.Pilot.pandaserver)
-                res = https.request(f'{url}/server/panda/getJob', data=data)
-                logger.info(f"Got jobs returns: {res}")
-
-                if res is None:
-                    resp_attrs = {'status': None, 'content': None, 'exception': exception.CommunicationFailure("Get job failed to get response from Panda.")}
-                    break
-                if res['StatusCode'] == 20 and 'no jobs in PanDA' in res['errorDialog']:
-                    resp_attrs = {'status': res['StatusCode'],
-                                  'content': None,
-                                  'exception': exception.CommunicationFailure("No jobs in panda")}
-                elif res['StatusCode'] != 0:
-                    resp_attrs = {'status': res['StatusCode'],
-                                  'content': None,
-                                  'exception': exception.CommunicationFailure(f"Get job from Panda returns a non-zero value: {res['StatusCode']}")}
-                    break
-                else:
-                    jobs.append(res)
-
-            if jobs:
-                resp_attrs = {'status': 0, 'content': jobs, 'exception': None}
-            elif not resp_attrs:
-                resp_attrs = {'status': -1, 'content': None, 'exception': exception.UnknownException("Failed to get jobs")}
-
-            resp = CommunicationResponse(resp_attrs)
-        except Exception as e:
-            logger.error(f"Failed to get jobs: {e}, {traceback.format_exc()}")
-            resp_attrs = {'status': -1, 'content': None, 'exception': exception.UnknownException(f"Failed to get jobs: {traceback.format_exc()}")}
-            resp = CommunicationResponse(resp_attrs)
-
-        self.get_jobs_lock.release()
+        with self.get_jobs_lock:
+            try:
+                jobs = []
+                resp_attrs = None
+
+                # get the data dictionary
+                data = self.get_data(req)
+
+                for _ in range(req.num_jobs):
+                    logger.info(f"Getting jobs: {data}")
+                    url = environ.get('PANDA_SERVER_URL', config.Pilot.pandaserver)
+                    res = https.request(f'{url}/server/panda/getJob', data=data)
+                    logger.info(f"Got jobs returns: {res}")
+
+                    if res is None:
+                        resp_attrs = {'status': None,
+                                      'content': None,
+                                      'exception': exception.CommunicationFailure("Get job failed to get response from Panda.")}
+                        break
+                    if res['StatusCode'] == 20 and 'no jobs in PanDA' in res['errorDialog']:
+                        resp_attrs = {'status': res['StatusCode'],
+                                      'content': None,
+                                      'exception': exception.CommunicationFailure("No jobs in panda")}
+                    elif res['StatusCode'] != 0:
+                        resp_attrs = {'status': res['StatusCode'],
+                                      'content': None,
+                                      'exception': exception.CommunicationFailure(f"Get job from Panda returns a non-zero value: {res['StatusCode']}")}
+                        break
+                    else:
+                        jobs.append(res)
+
+                if jobs:
+                    resp_attrs = {'status': 0, 'content': jobs, 'exception': None}
+                elif not resp_attrs:
+                    resp_attrs = {'status': -1, 'content': None, 'exception': exception.UnknownException("Failed to get jobs")}
+
+                resp = CommunicationResponse(resp_attrs)
+            except Exception as e:
+                logger.error(f"Failed to get jobs: {e}, {traceback.format_exc()}")
+                resp_attrs = {'status': -1, 'content': None, 'exception': exception.UnknownException(f"Failed to get jobs: {traceback.format_exc()}")}
+                resp = CommunicationResponse(resp_attrs)
 
         return resp
 
@@ -183,41 +185,38 @@ class PandaCommunicator(BaseCommunicator):
         :param req: request (Any)
         :return: CommunicationResponse({'status': 0}) (Any).
         """
-        self.get_events_lock.acquire()
-
-        try:
-            if not req.num_ranges:
-                # ToBeFix num_ranges with corecount
-                req.num_ranges = 1
-
-            data = {'pandaID': req.jobid,
-                    'jobsetID': req.jobsetid,
-                    'taskID': req.taskid,
-                    'nRanges': req.num_ranges}
-
-            logger.info(f"Downloading new event ranges: {data}")
-            url = environ.get('PANDA_SERVER_URL', config.Pilot.pandaserver)
-            res = https.request(f'{url}/server/panda/getEventRanges', data=data)
-            logger.info(f"Downloaded event ranges: {res}")
-
-            if res is None:
-                resp_attrs = {'status': -1,
-                              'content': None,
-                              'exception': exception.CommunicationFailure("Get events from panda returns None as return value")}
-            elif res['StatusCode'] == 0 or str(res['StatusCode']) == '0':
-                resp_attrs = {'status': 0, 'content': res['eventRanges'], 'exception': None}
-            else:
-                resp_attrs = {'status': res['StatusCode'],
-                              'content': None,
-                              'exception': exception.CommunicationFailure(f"Get events from panda returns non-zero value: {res['StatusCode']}")}
+        with self.get_events_lock:
+            try:
+                if not req.num_ranges:
+                    # ToBeFix num_ranges with corecount
+                    req.num_ranges = 1
+
+                data = {'pandaID': req.jobid,
+                        'jobsetID': req.jobsetid,
+                        'taskID': req.taskid,
+                        'nRanges': req.num_ranges}
+
+                logger.info(f"Downloading new event ranges: {data}")
+                url = environ.get('PANDA_SERVER_URL', config.Pilot.pandaserver)
+                res = https.request(f'{url}/server/panda/getEventRanges', data=data)
+                logger.info(f"Downloaded event ranges: {res}")
 
-            resp = CommunicationResponse(resp_attrs)
-        except Exception as e:  # Python 2/3
-            logger.error(f"Failed to download event ranges: {e}, {traceback.format_exc()}")
-            resp_attrs = {'status': -1, 'content': None, 'exception': exception.UnknownException(f"Failed to get events: {traceback.format_exc()}")}
-            resp = CommunicationResponse(resp_attrs)
+                if res is None:
+                    resp_attrs = {'status': -1,
+                                  'content': None,
+                                  'exception': exception.CommunicationFailure("Get events from panda returns None as return value")}
+                elif res['StatusCode'] == 0 or str(res['StatusCode']) == '0':
+                    resp_attrs = {'status': 0, 'content': res['eventRanges'], 'exception': None}
+                else:
+                    resp_attrs = {'status': res['StatusCode'],
+                                  'content': None,
+                                  'exception': exception.CommunicationFailure(f"Get events from panda returns non-zero value: {res['StatusCode']}")}
 
-        self.get_events_lock.release()
+                resp = CommunicationResponse(resp_attrs)
+            except Exception as e:  # Python 2/3
+                logger.error(f"Failed to download event ranges: {e}, {traceback.format_exc()}")
+                resp_attrs = {'status': -1, 'content': None, 'exception': exception.UnknownException(f"Failed to get events: {traceback.format_exc()}")}
+                resp = CommunicationResponse(resp_attrs)
 
         return resp
 
@@ -228,13 +227,6 @@ class PandaCommunicator(BaseCommunicator):
         :param req: request (Any)
         :return: CommunicationResponse({'status': 0}) (Any).
         """
-        self.update_events_lock.acquire()
-        try:
-            pass
-        except Exception as e:  # Python 2/3
-            logger.error(f"Failed to pre_check_update_events: {e}, {traceback.format_exc()}")
-        self.update_events_lock.release()
-
         return CommunicationResponse({'status': 0})
 
     def update_events(self, req: Any) -> Any:
@@ -244,22 +236,19 @@ class PandaCommunicator(BaseCommunicator):
         :param req: request (Any)
         :return: CommunicationResponse({'status': 0}) (Any).
         """
-        self.update_events_lock.acquire()
-
-        try:
-            logger.info(f"Updating events: {req}")
-            url = environ.get('PANDA_SERVER_URL', config.Pilot.pandaserver)
-            res = https.request(f'{url}/server/panda/updateEventRanges', data=req.update_events)
-
-            logger.info(f"Updated event ranges status: {res}")
-            resp_attrs = {'status': 0, 'content': res, 'exception': None}
-            resp = CommunicationResponse(resp_attrs)
-        except Exception as e:  # Python 2/3
-            logger.error(f"Failed to update event ranges: {e}, {traceback.format_exc()}")
-            resp_attrs = {'status': -1, 'content': None, 'exception': exception.UnknownException(f"Failed to update events: {traceback.format_exc()}")}
-            resp = CommunicationResponse(resp_attrs)
+        with self.update_events_lock:
+            try:
+                logger.info(f"Updating events: {req}")
+                url = environ.get('PANDA_SERVER_URL', config.Pilot.pandaserver)
+                res = https.request(f'{url}/server/panda/updateEventRanges', data=req.update_events)
 
-        self.update_events_lock.release()
+                logger.info(f"Updated event ranges status: {res}")
+                resp_attrs = {'status': 0, 'content': res, 'exception': None}
+                resp = CommunicationResponse(resp_attrs)
+            except Exception as e:  # Python 2/3
+                logger.error(f"Failed to update event ranges: {e}, {traceback.format_exc()}")
+                resp_attrs = {'status': -1, 'content': None, 'exception': exception.UnknownException(f"Failed to update events: {traceback.format_exc()}")}
+                resp = CommunicationResponse(resp_attrs)
 
         return resp
 
@@ -270,12 +259,6 @@ class PandaCommunicator(BaseCommunicator):
         :param req: request (Any)
         :return: CommunicationResponse({'status': 0}) (Any).
         """
-        try:
-            self.update_jobs_lock.acquire()
-
-            self.update_jobs_lock.release()
-        except Exception as exc:
-            logger.error(f"failed in pre_check_update_jobs: {exc}, {traceback.format_exc()}")
         return CommunicationResponse({'status': 0})
 
     def update_job(self, job: Any) -> int:
@@ -303,14 +286,15 @@ class PandaCommunicator(BaseCommunicator):
         :param req: request (Any)
         :return: CommunicationResponse({'status': 0}) (Any).
         """
-        self.update_jobs_lock.acquire()
-
+        # no lock needed, the job updates are independent of each other
         try:
             logger.info(f"Updating jobs: {req}")
-            res_list = []
-            for job in req.jobs:
-                res = self.update_job(job)
-                res_list.append(res)
+            if len(req.jobs) > 1:
+                # send the job updates in parallel (the results keep the order of the jobs)
+                with ThreadPoolExecutor(max_workers=min(len(req.jobs), MAX_UPDATE_WORKERS)) as executor:
+                    res_list = list(executor.map(self.update_job, req.jobs))
+            else:
+                res_list = [self.update_job(job) for job in req.jobs]
             resp_attrs = {'status': 0, 'content': res_list, 'exception': None}
             resp = CommunicationResponse(resp_attrs)
         except Exception as e:  # Python 2/3
@@ -318,6 +302,4 @@ class PandaCommunicator(BaseCommunicator):
             resp_attrs = {'status': -1, 'content': None, 'exception': exception.UnknownException(f"Failed to update jobs: {traceback.format_exc()}")}
             resp = CommunicationResponse(resp_attrs)
 
-        self.update_jobs_lock.release()
-
         return resp
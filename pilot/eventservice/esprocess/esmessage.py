@@ -23,8 +23,8 @@
 
 import logging
 import os
+import queue
 import threading
-import time
 import traceback
 from typing import Any
 
@@ -32,6 +32,9 @@ from pilot.common.exception import PilotException, MessageFailure
 
 logger = logging.getLogger(__name__)
 
+MIN_POLL_INTERVAL = 0.0005  # s, poll interval after a message has been received
+MAX_POLL_INTERVAL = 0.02  # s, maximum poll interval when no messages arrive
+
 
 class MessageThread(threading.Thread):
     """A thread to receive messages from payload and put recevied messages to the out queues."""
@@ -90,6 +93,22 @@ class MessageThread(threading.Thread):
         except Exception as exc:
             raise MessageFailure(exc) from exc
 
+    def put_message(self, message: str):
+        """
+        Put a received message into the message queue.
+
+        If the (bounded) queue is full, wait until there is space again rather than dropping the message. While
+        waiting, no new messages are read from the payload, which is thereby slowed down to the pace of the consumer.
+
+        :param message: message (str).
+        """
+        while not self.is_stopped():
+            try:
+                self.__message_queue.put(message, timeout=1)
+                return
+            except queue.Full:
+                logger.warning(f'message queue is full (size={self.__message_queue.qsize()}), waiting for the consumer')
+
     def stop(self):
         """Set stop event."""
         logger.debug('set stop event')
@@ -104,15 +123,26 @@ class MessageThread(threading.Thread):
         return self.__stop.is_set()
 
     def terminate(self):
-        """Terminate message server."""
+        """
+        Terminate message server.
+
+        The socket is closed explicitly (if supported by yampl), rather than relying on garbage collection, so
+        that the socket is released even if references to the server object remain (e.g. in a traceback).
+        """
         if self.__message_server:
             logger.info("terminating message server.")
-            del self.__message_server
+            close = getattr(self.__message_server, 'close', None)
+            if close:
+                try:
+                    close()
+                except Exception as exc:
+                    logger.warning(f'failed to close message server: {exc}')
             self.__message_server = None
 
     def run(self):
         """Poll messages from payload and put received into message queue for other processes to fetch."""
         logger.info('message thread starts to run')
+        backoff = MIN_POLL_INTERVAL
         try:
             while True:
                 if self.is_stopped():
@@ -123,9 +153,13 @@ class MessageThread(threading.Thread):
 
                 size, buf = self.__message_server.try_recv_raw()
                 if size == -1:
-                    time.sleep(0.01)
+                    # no message: back off exponentially while idle (the wait is interrupted by stop())
+                    self.__stop.wait(backoff)
+                    backoff = min(backoff * 2, MAX_POLL_INTERVAL)
                 else:
-                    self.__message_queue.put(buf.decode('utf8'))  # Python 2 and 3
+                    # poll again immediately, messages often arrive in bursts
+                    backoff = MIN_POLL_INTERVAL
+                    self.put_message(buf.decode('utf8', errors='replace'))
         except PilotException as exc:
             self.terminate()
             logger.error(f"Pilot Exception: message thread got an exception, will finish: {exc.get_detail()}, {traceback.format_exc()}")
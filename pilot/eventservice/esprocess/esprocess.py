@@ -69,7 +69,8 @@ class ESProcess(threading.Thread):
         """
         threading.Thread.__init__(self, name='esprocess')
 
-        self.__message_queue = queue.Queue()
+        # bounded, so that a stalled consumer applies backpressure on the payload instead of growing the queue
+        self.__message_queue = queue.Queue(maxsize=int(os.environ.get('PILOT_ESMSG_QSIZE', 10000)))
         self.__payload = payload
 
         self.__message_thread = None
@@ -570,6 +571,16 @@ class ESProcess(threading.Thread):
         """
         return self.__ret_code
 
+    def wait(self, timeout: float = None) -> bool:
+        """
+        Wait for the process to finish.
+
+        :param timeout: maximum waiting time in seconds, None means no limit (float)
+        :return: True if the process has finished, False if the timeout expired (bool).
+        """
+        self.join(timeout=timeout)
+        return not self.is_alive()
+
     def terminate(self, time_to_wait: int = 1):
         """
         Terminate running threads and processes.
@@ -136,7 +136,7 @@ class BaseExecutor(threading.Thread, PluginFactory):
             return self.payload
 
     def get_job(self):
-        return self.payload['job'] if self.payload and 'job' in list(self.payload.keys()) else None  # Python 2/3
+        return self.payload['job'] if self.payload and 'job' in self.payload else None
 
     def get_event_ranges(self, num_event_ranges=1, queue_factor=2):
         if os.environ.get('PILOT_ES_EXECUTOR_TYPE', 'generic') == 'raythena':
@@ -21,11 +21,13 @@
 
 """HPO executor."""
 
-import json
 import logging
 import os
+import threading
 import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from typing import Any
 
 from pilot.common.errorcodes import ErrorCodes
@@ -34,11 +36,35 @@ from pilot.eventservice.esprocess.esprocess import ESProcess
 from pilot.info.filespec import FileSpec
 from pilot.util.config import config
 from pilot.util.filehandling import calculate_checksum
+from pilot.util.https import json_dumps
 from .baseexecutor import BaseExecutor
 
 logger = logging.getLogger(__name__)
 errors = ErrorCodes()
 
+MIN_POLL_INTERVAL = 0.1  # initial waiting time (s) between checks of the ESProcess
+MAX_POLL_INTERVAL = 5  # maximum waiting time (s) between checks of the ESProcess
+MONITOR_LOG_INTERVAL = 300  # time (s) between status log messages
+MAX_CHECKSUM_WORKERS = 4  # maximum number of threads calculating output file checksums
+MAX_STAGEOUT_BATCH = 64  # number of queued outputs that triggers a stage-out before es_stageout_gap has passed
+
+
+@lru_cache(maxsize=1024)
+def get_checksum(pfn: str, mtime_ns: int, filesize: int, algorithm: str) -> str:
+    """
+    Calculate the checksum of the given file.
+
+    The modification time and size are part of the cache key, so that a file which is reported again
+    (e.g. in a re-emitted status message) is only read once, unless it has been modified in between.
+
+    :param pfn: physical file name (str)
+    :param mtime_ns: modification time of the file in ns (int)
+    :param filesize: file size (int)
+    :param algorithm: checksum algorithm (str)
+    :return: checksum (str).
+    """
+    return calculate_checksum(pfn, algorithm=algorithm)
+
 
 class HPOExecutor(BaseExecutor):
     """HPO executor class."""
@@ -51,11 +77,16 @@ class HPOExecutor(BaseExecutor):
         """
         super(HPOExecutor, self).__init__(**kwargs)
         self.setName("HPOExecutor")
-        self.__queued_out_messages = []
+        self.__queued_out_messages = []  # (message, future file spec) pairs
+        self.__queued_out_messages_lock = threading.Lock()
+        self.__file_spec_futures = {}  # pfn: future file spec, for the queued out messages
         self.__last_stageout_time = None
         self.__all_out_messages = []
         self.proc = None
         self.exit_code = None
+        # file specs (checksums) are created in the background, to keep the run() loop responsive
+        self.__checksum_pool = ThreadPoolExecutor(max_workers=min(MAX_CHECKSUM_WORKERS, os.cpu_count() or 1),
+                                                  thread_name_prefix='hpo_checksum')
 
     def is_payload_started(self) -> bool:
         """
@@ -89,11 +120,13 @@ class HPOExecutor(BaseExecutor):
         :return: a file spec (FileSpec).
         """
         try:
-            checksum = calculate_checksum(pfn, algorithm=config.File.checksum_type)
+            stat = os.stat(pfn)
+            filesize = stat.st_size
+            checksum = get_checksum(pfn, stat.st_mtime_ns, filesize, config.File.checksum_type)
         except (FileHandlingFailure, NotImplementedError, Exception) as exc:
             logger.warning(f'caught exception: {exc}')
             checksum = ''  # fail later
-        filesize = os.path.getsize(pfn)
+            filesize = os.path.getsize(pfn)
         file_data = {'scope': 'transient',
                      'lfn': os.path.basename(pfn),
                      'checksum': checksum,
@@ -102,11 +135,11 @@ class HPOExecutor(BaseExecutor):
         file_spec = FileSpec(filetype='output', **file_data)
         return file_spec
 
-    def update_finished_event_ranges(self, out_messages: Any) -> None:
+    def update_finished_event_ranges(self, out_messages: list) -> None:
         """
         Update finished event ranges.
 
-        :param out_messages: messages from AthenaMP (Any).
+        :param out_messages: (message from AthenaMP, future file spec) pairs (list).
         """
         logger.info("update_finished_event_ranges:")
 
@@ -114,14 +147,13 @@ class HPOExecutor(BaseExecutor):
             return
 
         event_ranges = []
-        for out_msg in out_messages:
-            fspec = self.create_file_spec(out_msg['output'])
+        for out_msg, future in out_messages:
+            fspec = future.result()
             event_range_status = {"eventRangeID": out_msg['id'], "eventStatus": 'finished', "pfn": out_msg['output'], "fsize": fspec.filesize}
-            for checksum_key in fspec.checksum:
-                event_range_status[checksum_key] = fspec.checksum[checksum_key]
+            event_range_status.update(fspec.checksum)
             event_ranges.append(event_range_status)
         event_ranges_status = {"esOutput": {"numEvents": len(event_ranges)}, "eventRanges": event_ranges}
-        event_range_message = {'version': 1, 'eventRanges': json.dumps([event_ranges_status])}
+        event_range_message = {'version': 1, 'eventRanges': json_dumps([event_ranges_status])}
         self.update_events(event_range_message)
 
         job = self.get_job()
@@ -141,8 +173,8 @@ class HPOExecutor(BaseExecutor):
             status = message['status'] if message['status'] in ['failed', 'fatal'] else 'failed'
             # ToBeFixed errorCode
             event_ranges.append({"errorCode": errors.UNKNOWNPAYLOADFAILURE, "eventRangeID": message['id'], "eventStatus": status})
-            event_range_message = {'version': 0, 'eventRanges': json.dumps(event_ranges)}
-            self.update_events(event_range_message)
+        event_range_message = {'version': 0, 'eventRanges': json_dumps(event_ranges)}
+        self.update_events(event_range_message)
 
     def handle_out_message(self, message: dict):
         """
@@ -161,35 +193,66 @@ class HPOExecutor(BaseExecutor):
         if message['status'] in ['failed', 'fatal']:
             self.update_failed_event_ranges([message])
         else:
-            self.__queued_out_messages.append(message)
+            pfn = message['output']
+            with self.__queued_out_messages_lock:
+                # several event ranges can share an output file; the file spec is only created once for them,
+                # unless the creation has already started (the file might have been updated since)
+                future = self.__file_spec_futures.get(pfn)
+                if future is None or future.running() or future.done():
+                    future = self.__checksum_pool.submit(self.create_file_spec, pfn)
+                    self.__file_spec_futures[pfn] = future
+                self.__queued_out_messages.append((message, future))
 
     def stageout_es(self, force: bool = False):
         """
         Stage out event service outputs.
 
-        :param force: force stage out (bool).
+        The outputs are staged out once es_stageout_gap seconds have passed since the previous stage-out,
+        or earlier if MAX_STAGEOUT_BATCH outputs are queued.
+
+        :param force: force stage out (bool)
+        :return: True if any outputs were staged out, False otherwise (bool).
         """
         job = self.get_job()
         if len(self.__queued_out_messages):
-            if force or self.__last_stageout_time is None or (time.time() > self.__last_stageout_time + job.infosys.queuedata.es_stageout_gap):
-                out_messages = []
-                while len(self.__queued_out_messages) > 0:
-                    out_messages.append(self.__queued_out_messages.pop())
-                self.update_finished_event_ranges(out_messages)
+            if force or self.__last_stageout_time is None or \
+                    time.time() > self.__last_stageout_time + job.infosys.queuedata.es_stageout_gap or \
+                    len(self.__queued_out_messages) >= MAX_STAGEOUT_BATCH:
+                with self.__queued_out_messages_lock:
+                    if force:  # take over the whole queue (in arrival order)
+                        out_messages, self.__queued_out_messages = self.__queued_out_messages, []
+                    else:  # only stage out the outputs whose file specs are ready
+                        out_messages = []
+                        pending = []
+                        for item in self.__queued_out_messages:
+                            (out_messages if item[1].done() else pending).append(item)
+                        self.__queued_out_messages = pending
+                    for message, future in out_messages:
+                        if self.__file_spec_futures.get(message['output']) is future:
+                            del self.__file_spec_futures[message['output']]
+                if out_messages:
+                    self.update_finished_event_ranges(out_messages)
+                    self.__last_stageout_time = time.time()
+                    return True
+
+        return False
 
     def clean(self):
         """Clean temp produced files."""
         logger.info("shutting down...")
 
         self.__queued_out_messages = []
+        self.__file_spec_futures = {}
         self.__last_stageout_time = None
         self.__all_out_messages = []
 
         if self.proc:
             self.proc.stop()
-            while self.proc.is_alive():
-                time.sleep(0.1)
+            # the ESProcess terminates the payload itself once the stop delay has passed
+            while not self.proc.wait(timeout=60):
+                logger.info(f'waiting for ESProcess to finish (pid={self.proc.pid})')
 
+        self.__checksum_pool.shutdown(wait=False)
         self.stop_communicator()
 
     def run(self):
@@ -219,21 +282,27 @@ class HPOExecutor(BaseExecutor):
 
             exit_code = None
             iteration = 0
+            interval = MIN_POLL_INTERVAL
+            last_log_time = time.time()
             while proc.is_alive():
                 iteration += 1
                 if self.is_stop():
                     logger.info(f'stop is set. breaking -- stop process pid={proc.pid}')
                     proc.stop()
                     break
-                self.stageout_es()
+                staged_out = self.stageout_es()
 
                 exit_code = proc.poll()
-                if iteration % 60 == 0:
+                if time.time() - last_log_time > MONITOR_LOG_INTERVAL:
                     logger.info(f'running: iteration={iteration} pid={proc.pid} exit_code={exit_code}')
-                time.sleep(5)
+                    last_log_time = time.time()
 
-            while proc.is_alive():
-                time.sleep(1)
+                # back off while there is nothing to do, but return as soon as the process finishes
+                interval = MIN_POLL_INTERVAL if staged_out else min(2 * interval, MAX_POLL_INTERVAL)
+                proc.join(timeout=interval)
+
+            while not proc.wait(timeout=60):
+                logger.info(f'waiting for ESProcess to finish (pid={proc.pid})')
             logger.info("ESProcess finished")
 
             self.stageout_es(force=True)
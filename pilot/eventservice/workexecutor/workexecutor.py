@@ -83,7 +83,7 @@ class WorkExecutor(PluginFactory):
         :return: plugin configurations (dict).
         """
         plugin_confs = {}
-        if self.args and 'executor_type' in list(self.args.keys()):  # Python 2/3
+        if self.args and 'executor_type' in self.args:
             if self.args['executor_type'] == 'hpo':
                 plugin_confs = {'class': 'pilot.eventservice.workexecutor.plugins.hpoexecutor.HPOExecutor'}
             elif self.args['executor_type'] == 'raythena':
@@ -53,6 +53,20 @@ class BaseData:
     """
 
     _keys = {}
+    _key_specs = ()  # (type, name, custom validator name or None) for all attributes in _keys, set per subclass
+
+    def __init_subclass__(cls, **kwargs):
+        """
+        Prepare the attribute specification of a subclass.
+
+        The attributes to load, their types and the names of the custom validation functions (clean__<name>)
+        only depend on the class, so they are resolved once here rather than on every _load_data() call.
+
+        :param kwargs: class keyword arguments (dict).
+        """
+        super().__init_subclass__(**kwargs)
+        cls._key_specs = tuple((ktype, kname, f'clean__{kname}' if callable(getattr(cls, f'clean__{kname}', None)) else None)
+                               for ktype, knames in cls._keys.items() for kname in knames)
 
     def _load_data(self, data: dict, kmap: dict = None, validators: dict = None):
         """
@@ -87,30 +101,27 @@ class BaseData:
                           None: self.clean_string,  # default validator
                           }
 
-        for ktype, knames in list(self._keys.items()):
-
-            for kname in knames:
-                raw, value = None, None
+        for ktype, kname, custom_validator in self._key_specs:
+            raw, value = None, None
 
-                ext_names = kmap.get(kname) or kname
-                if isinstance(ext_names, str):
-                    ext_names = [ext_names]
+            ext_names = kmap.get(kname) or kname
+            if isinstance(ext_names, str):
+                ext_names = [ext_names]
 
-                for name in ext_names:
-                    raw = data.get(name)
-                    if raw is not None:
-                        break
+            for name in ext_names:
+                raw = data.get(name)
+                if raw is not None:
+                    break
 
-                ## cast to required type and apply default validation
-                hvalidator = validators.get(ktype, validators.get(None))
-                if callable(hvalidator):
-                    value = hvalidator(raw, ktype, kname, defval=copy.deepcopy(getattr(self, kname, None)))
-                ## apply custom validation if defined
-                hvalidator = getattr(self, f'clean__{kname}', None)
-                if callable(hvalidator):
-                    value = hvalidator(raw, value)
+            ## cast to required type and apply default validation
+            hvalidator = validators.get(ktype, validators.get(None))
+            if callable(hvalidator):
+                value = hvalidator(raw, ktype, kname, defval=copy.deepcopy(getattr(self, kname, None)))
+            ## apply custom validation if defined
+            if custom_validator:
+                value = getattr(self, custom_validator)(raw, value)
 
-                setattr(self, kname, value)
+            setattr(self, kname, value)
 
         self.clean()
 
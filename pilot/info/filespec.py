@@ -77,6 +77,7 @@ class FileSpec(BaseData):
     is_tar = False     # whether it's a tar file or not
     ddm_activity = None  # DDM activity names (e.g. [read_lan, read_wan]) which should be used to resolve appropriate protocols from StorageData.arprotocols
     checkinputsize = True
+    _guid_nodash = None  # cached (guid, guid without dashes) pair, see guid_nodash property
 
     # specify the type of attributes for proper data validation and casting
     _keys = {int: ['filesize', 'mtime', 'status_code'],
@@ -157,6 +158,36 @@ class FileSpec(BaseData):
             self.surl = self.lfn
             self.lfn = os.path.basename(self.lfn)
 
+    @property
+    def guid_nodash(self) -> str:
+        """
+        Return the GUID without dashes, as used in the trace reports.
+
+        The value is cached, and recalculated only if the GUID has changed (output file GUIDs are set after the payload).
+
+        :return: GUID without dashes (str).
+        """
+        if self._guid_nodash is None or self._guid_nodash[0] != self.guid:
+            self._guid_nodash = (self.guid, self.guid.replace('-', ''))
+
+        return self._guid_nodash[1]
+
+    @property
+    def checksum_kv(self) -> str:
+        """
+        Return the checksum in the form 'type:value' as expected by transfer tools.
+
+        Only the first entry of the checksum dictionary is used. The value is not cached, since the checksum
+        dictionary is updated in place (e.g. when the checksum of an output file is calculated).
+
+        :return: checksum string, or empty string if no checksum is known (str).
+        """
+        if not self.checksum:
+            return ''
+
+        ctype, checksum = next(iter(self.checksum.items()))
+        return f'{ctype}:{checksum}'
+
     def is_directaccess(self, ensure_replica: bool = True, allowed_replica_schemas: list = None) -> bool:
         """
         Check if given (input) file can be used for direct access mode by job transformation script.
@@ -187,7 +218,7 @@ class FileSpec(BaseData):
         if ensure_replica:
 
             allowed_replica_schemas = allowed_replica_schemas or ['root', 'dcache', 'dcap', 'file', 'https']
-            if not self.turl or not any([self.turl.startswith(f'{allowed}://') for allowed in allowed_replica_schemas]):
+            if not self.turl or not any(self.turl.startswith(f'{allowed}://') for allowed in allowed_replica_schemas):
                 _is_directaccess = False
 
         return _is_directaccess
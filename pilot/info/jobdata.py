@@ -552,7 +552,7 @@ class JobData(BaseData):
         :return: True if at least one file should use direct access mode
         """
 
-        return any([fspec.status == 'remote_io' for fspec in self.indata])
+        return any(fspec.status == 'remote_io' for fspec in self.indata)
 
     def clean(self):
         """
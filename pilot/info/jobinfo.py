@@ -96,10 +96,8 @@ class JobInfoProvider:
 
         ## use job.overwrite_storagedata as a master source
         master_data = self.job.overwrite_storagedata or {}
-        try:
-            data.update((k, v) for k, v in master_data.iteritems() if k in set(ddmendpoints or master_data) & set(master_data))  # Python 2
-        except Exception:
-            data.update((k, v) for k, v in list(master_data.items()) if k in set(ddmendpoints or master_data) & set(master_data))  # Python 3
+        keys = set(ddmendpoints or master_data) & set(master_data)
+        data.update((k, v) for k, v in master_data.items() if k in keys)
 
         if data:
             logger.info(f'storagedata: following data extracted from Job definition will be used: {data}')
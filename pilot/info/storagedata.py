@@ -31,6 +31,7 @@ The main reasons for such incapsulation are to
 :contact: anisyonk@cern.ch
 :date: January 2018
 """
+import time
 import traceback
 from os import environ
 
@@ -41,6 +42,9 @@ from .basedata import BaseData
 import logging
 logger = logging.getLogger(__name__)
 
+KEY_PAIR_CACHE_TIME = 3600  # time (s) a key pair downloaded from the server is reused
+key_pairs = {}  # (secret key name, access key name): (download time, key pair), shared by all StorageData objects
+
 
 class StorageData(BaseData):
     """
@@ -116,17 +120,27 @@ class StorageData(BaseData):
     def get_security_key(self, secret_key, access_key):
         """
             Get security key pair from panda
+            A key pair is downloaded at most once per KEY_PAIR_CACHE_TIME (unless the download fails).
             :param secret_key: secrect key name as string
             :param access_key: access key name as string
             :return: setup as a string
         """
+        cached = key_pairs.get((secret_key, access_key))
+        if cached and time.time() - cached[0] < KEY_PAIR_CACHE_TIME:
+            return cached[1]
+
         try:
             data = {'privateKeyName': secret_key, 'publicKeyName': access_key}
             logger.info(f"Getting key pair: {data}")
             url = environ.get('PANDA_SERVER_URL', config.Pilot.pandaserver)
-            res = https.request(f'{url}/server/panda/getKeyPair', data=data)
+            # try the shared (keep-alive) session first, then the curl based request
+            res = https.request_session(f'{url}/server/panda/getKeyPair', data=data)
+            if res is None:
+                res = https.request(f'{url}/server/panda/getKeyPair', data=data)
             if res and res['StatusCode'] == 0:
-                return {"publicKey": res["publicKey"], "privateKey": res["privateKey"]}
+                key_pair = {"publicKey": res["publicKey"], "privateKey": res["privateKey"]}
+                key_pairs[(secret_key, access_key)] = (time.time(), key_pair)
+                return key_pair
             else:
                 logger.info(f"Got key pair returns wrong value: {res}")
         except Exception as exc:
@@ -144,7 +158,7 @@ class StorageData(BaseData):
         if protocol_id in self.special_setup and self.special_setup[protocol_id]:
             return self.special_setup[protocol_id]
 
-        if protocol_id is None or str(protocol_id) not in list(self.rprotocols.keys()):  # Python 2/3
+        if protocol_id is None or str(protocol_id) not in self.rprotocols:
             return None
 
         if self.type in ['OS_ES', 'OS_LOGS']:
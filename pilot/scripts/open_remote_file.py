@@ -205,7 +205,7 @@ def interrupt(_args: Any, signum: Any, frame: Any):
         logger.warning('process already being killed')
         return
 
-    sig = [v for v, k in list(signal.__dict__.items()) if k == signum][0]
+    sig = signal.Signals(signum).name  # e.g. 'SIGTERM'
     tmp = '\n'.join(traceback.format_stack(frame))
     logger.warning(f'caught signal: {sig} in FRAME=\n{tmp}')
     cmd = f'ps aux | grep {os.getpid()}'
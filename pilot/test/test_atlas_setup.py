@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Unit tests for the ATLAS setup functions."""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from pilot.user.atlas import setup
+
+
+class TestReplaceLfnsInFile(unittest.TestCase):
+    """Unit tests for replace_lfns_in_file()."""
+
+    def setUp(self):
+        """Create a work directory with an input file list."""
+        self.workdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.workdir, 'tmpin_mc16_13TeV.txt')
+        self.content = 'AOD.1.pool.root.1\n\n/some/dir/AOD.2.pool.root.1\nAOD.3.pool.root.1\n'
+        with open(self.path, 'w', encoding='utf-8') as _file:
+            _file.write(self.content)
+        self.turls = {'AOD.1.pool.root.1': 'root://host//path/AOD.1.pool.root.1',
+                      'AOD.2.pool.root.1': 'root://host//path/AOD.2.pool.root.1'}
+
+    def tearDown(self):
+        """Remove the work directory."""
+        shutil.rmtree(self.workdir)
+
+    def read(self):
+        """Return the content of the input file list."""
+        with open(self.path, 'r', encoding='utf-8') as _file:
+            return _file.read()
+
+    def test_replace_lfns_in_file(self):
+        """Make sure that known LFNs are replaced with TURLs, unknown ones are kept and empty lines are dropped."""
+        setup.replace_lfns_in_file(self.path, self.turls)
+
+        self.assertEqual(self.read(), 'root://host//path/AOD.1.pool.root.1\nroot://host//path/AOD.2.pool.root.1\nAOD.3.pool.root.1')
+        self.assertEqual(os.listdir(self.workdir), [os.path.basename(self.path)])
+
+    def test_empty_file(self):
+        """Make sure that a file without any non-empty lines is left untouched."""
+        with open(self.path, 'w', encoding='utf-8') as _file:
+            _file.write('\n\n')
+        setup.replace_lfns_in_file(self.path, self.turls)
+
+        self.assertEqual(self.read(), '\n\n')
+        self.assertEqual(os.listdir(self.workdir), [os.path.basename(self.path)])
+
+    def test_error_during_write(self):
+        """Make sure that the original file is left intact and the temporary file is removed after a failed write."""
+        class FailingDict(dict):
+            """Dictionary that fails on the second lookup, i.e. after the first line has been written."""
+
+            lookups = 0
+
+            def get(self, *args):
+                self.lookups += 1
+                if self.lookups > 1:
+                    raise self.exception
+                return super().get(*args)
+
+        for exception in (OSError('no space left on device'), RuntimeError('unexpected')):
+            turls = FailingDict(self.turls)
+            turls.exception = exception
+            if isinstance(exception, OSError):
+                setup.replace_lfns_in_file(self.path, turls)  # the error is logged
+            else:
+                with self.assertRaises(RuntimeError):
+                    setup.replace_lfns_in_file(self.path, turls)
+
+            self.assertEqual(self.read(), self.content)
+            self.assertEqual(os.listdir(self.workdir), [os.path.basename(self.path)])
+
+    def test_error_during_replace(self):
+        """Make sure that the original file is left intact if the temporary file can not be moved into place."""
+        with mock.patch.object(setup.os, 'replace', side_effect=OSError('permission denied')):
+            setup.replace_lfns_in_file(self.path, self.turls)
+
+        self.assertEqual(self.read(), self.content)
+        self.assertEqual(os.listdir(self.workdir), [os.path.basename(self.path)])
+
+
+class TestReplaceLfnsWithTurls(unittest.TestCase):
+    """Unit tests for replace_lfns_with_turls()."""
+
+    def setUp(self):
+        """Create a work directory with a (dummy) file catalog."""
+        self.workdir = tempfile.mkdtemp()
+        self.filename = 'PoolFileCatalog.xml'
+        with open(os.path.join(self.workdir, self.filename), 'w', encoding='utf-8') as _file:
+            _file.write('<POOLFILECATALOG/>')
+        self.lfns = ['AOD.1.pool.root.1', 'AOD.1.pool.root.10', 'xAOD.1.pool.root.1']
+        self.file_info = {lfn: [f'root://host//path/{lfn}', 'guid'] for lfn in self.lfns}
+
+    def tearDown(self):
+        """Remove the work directory."""
+        shutil.rmtree(self.workdir)
+
+    def replace(self, cmd, infiles, writetofile=''):
+        """Call replace_lfns_with_turls() with the file catalog content mocked."""
+        with mock.patch.object(setup, 'get_file_info_from_xml', return_value=self.file_info):
+            return setup.replace_lfns_with_turls(cmd, self.workdir, self.filename, infiles, writetofile=writetofile)
+
+    def test_overlapping_lfns(self):
+        """Make sure that an LFN that is a substring of a longer LFN only replaces its own occurrences."""
+        cmd = 'athena --inputAODFile=AOD.1.pool.root.10,AOD.1.pool.root.1,xAOD.1.pool.root.1'
+        expected = 'athena --inputAODFile=root://host//path/AOD.1.pool.root.10,root://host//path/AOD.1.pool.root.1,' \
+                   'root://host//path/xAOD.1.pool.root.1'
+        self.assertEqual(self.replace(cmd, self.lfns), expected)
+
+        # the order of the input files does not matter
+        self.assertEqual(self.replace(cmd, list(reversed(self.lfns))), expected)
+
+    def test_only_longer_lfn_in_command(self):
+        """Make sure that a shorter LFN that only occurs as part of a longer LFN is not replaced."""
+        cmd = 'athena --inputAODFile=AOD.1.pool.root.10'
+        self.assertEqual(self.replace(cmd, self.lfns[:2]), 'athena --inputAODFile=root://host//path/AOD.1.pool.root.10')
+
+    def test_turl_already_in_command(self):
+        """Make sure that LFNs are not replaced inside TURLs that are already present or have just been inserted."""
+        cmd = 'athena --inputAODFile=root://host//path/AOD.1.pool.root.1'
+        self.assertEqual(self.replace(cmd, self.lfns), cmd)
+
+    def test_writetofile(self):
+        """Make sure that the LFNs found in the command are also replaced in the writeToFile input file list."""
+        with open(os.path.join(self.workdir, 'tmpin_AOD.txt'), 'w', encoding='utf-8') as _file:
+            _file.write('AOD.1.pool.root.1\nAOD.1.pool.root.10\n')
+
+        self.replace('athena AOD.1.pool.root.10 AOD.1.pool.root.1', self.lfns, writetofile='tmpin_AOD.txt:AOD.1.pool.root.1')
+        with open(os.path.join(self.workdir, 'tmpin_AOD.txt'), 'r', encoding='utf-8') as _file:
+            self.assertEqual(_file.read(), 'root://host//path/AOD.1.pool.root.1\nroot://host//path/AOD.1.pool.root.10')
+
+
+if __name__ == '__main__':
+    unittest.main()
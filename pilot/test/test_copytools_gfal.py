@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Unit test functions for the bulk download mode of the copytool gfal."""
+
+import os
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+from zlib import adler32
+
+from pilot.copytool import gfal
+
+
+class TestCopytoolGfalBulk(unittest.TestCase):
+    """Unit tests for copy_in_bulk() and is_valid_for_bulk()."""
+
+    def setUp(self):
+        """Create a work directory."""
+        self.workdir = tempfile.mkdtemp()
+        self.sources = []  # content of the list files passed to gfal-copy
+        self.commands = []
+
+    def tearDown(self):
+        """Remove the work directory."""
+        shutil.rmtree(self.workdir)
+
+    @staticmethod
+    def get_fspec(lfn, content=b'', workdir='', turl=None, checksum=None):
+        """Return a minimal file spec for the given content."""
+        if checksum is None:
+            checksum = {'adler32': f'{adler32(content) & 0xffffffff:08x}'}
+        return SimpleNamespace(lfn=lfn, turl=turl if turl is not None else f'root://host//path/{lfn}',
+                               checksum=checksum, filesize=len(content), workdir=workdir,
+                               status=None, status_code=0)
+
+    def get_execute(self, contents, rcode=0):
+        """
+        Return a fake execute() function that downloads the files listed in the --from-file list file.
+
+        :param contents: content to write per LFN, files not in the dictionary are not downloaded (dict)
+        :param rcode: exit code of the fake gfal-copy command (int)
+        :return: fake execute function (function).
+        """
+        def execute(cmd, **kwargs):
+            self.commands.append(cmd)
+            listfile = cmd[cmd.index('--from-file') + 1]
+            dst = cmd[-1][len('file://'):]
+            with open(listfile, 'r', encoding='utf-8') as _file:
+                urls = _file.read().splitlines()
+            self.sources.append((os.path.dirname(listfile), urls))
+            for url in urls:
+                lfn = os.path.basename(url)
+                if lfn in contents:
+                    with open(os.path.join(dst, lfn), 'wb') as _file:
+                        _file.write(contents[lfn])
+            return rcode, '', 'some error' if rcode else ''
+
+        return execute
+
+    def test_is_valid_for_bulk(self):
+        """Make sure that only files with a catalog checksum and a source URL ending with the LFN are eligible."""
+        self.assertTrue(gfal.is_valid_for_bulk(self.get_fspec('a.root')))
+        self.assertFalse(gfal.is_valid_for_bulk(self.get_fspec('a.root', turl='')))
+        self.assertFalse(gfal.is_valid_for_bulk(self.get_fspec('a.root', checksum='')))
+        self.assertFalse(gfal.is_valid_for_bulk(self.get_fspec('a.root', turl='root://host//path/b.root')))
+        self.assertFalse(gfal.is_valid_for_bulk(self.get_fspec('a.root', turl='https://host/path/a.root?token=x')))
+
+    def test_bulk_download(self):
+        """Make sure that a single gfal-copy call is made per destination and that all files are verified."""
+        contents = {'a.root': b'aaaa', 'b.root': b'bbbbbb', 'c.root': b'c'}
+        files = [self.get_fspec(lfn, content) for lfn, content in contents.items()]
+
+        with mock.patch.object(gfal, 'execute', side_effect=self.get_execute(contents)):
+            transferred = gfal.copy_in_bulk(files, workdir=self.workdir)
+
+        self.assertEqual(transferred, files)
+        self.assertEqual(len(self.commands), 1)
+        self.assertEqual(self.commands[0][-1], f'file://{self.workdir}/')
+        # the list file is written into the destination directory and removed afterwards
+        self.assertEqual(self.sources, [(self.workdir, [fspec.turl for fspec in files])])
+        self.assertEqual([name for name in os.listdir(self.workdir) if name.startswith('gfal_sources_')], [])
+        for fspec in files:
+            self.assertEqual((fspec.status, fspec.status_code), ('transferred', 0))
+
+    def test_bulk_download_partial_failure(self):
+        """Make sure that missing, truncated or corrupted files are left for the individual transfers."""
+        contents = {'a.root': b'aaaa', 'b.root': b'bbbbbb', 'c.root': b'cc', 'd.root': b'dddd'}
+        files = [self.get_fspec(lfn, content) for lfn, content in contents.items()]
+        downloaded = {'a.root': b'aaaa', 'b.root': b'bbb', 'c.root': b'xx'}  # d.root is missing
+
+        with mock.patch.object(gfal, 'execute', side_effect=self.get_execute(downloaded, rcode=1)):
+            transferred = gfal.copy_in_bulk(files, workdir=self.workdir)
+
+        self.assertEqual(transferred, files[:1])
+        self.assertEqual((files[0].status, files[0].status_code), ('transferred', 0))
+        for fspec in files[1:]:
+            # the status set by the failed checksum verification is reset
+            self.assertEqual((fspec.status, fspec.status_code), (None, 0))
+
+    def test_bulk_download_groups(self):
+        """Make sure that files are grouped by destination and that single or ineligible files are skipped."""
+        other = os.path.join(self.workdir, 'other')
+        os.mkdir(other)
+        contents = {'a.root': b'a', 'b.root': b'b', 'c.root': b'c', 'd.root': b'd'}
+        files = [self.get_fspec('a.root', b'a'),
+                 self.get_fspec('b.root', b'b'),
+                 self.get_fspec('c.root', b'c', workdir=other),  # only file for this destination
+                 self.get_fspec('d.root', b'd', checksum='')]  # no catalog checksum
+
+        with mock.patch.object(gfal, 'execute', side_effect=self.get_execute(contents)):
+            transferred = gfal.copy_in_bulk(files, workdir=self.workdir)
+
+        self.assertEqual(transferred, files[:2])
+        self.assertEqual(self.sources, [(self.workdir, [files[0].turl, files[1].turl])])
+        self.assertEqual(os.listdir(other), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Unit test functions for the copytool s3."""
+
+import os
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from pilot.common.exception import PilotException
+from pilot.copytool import s3
+from pilot.copytool.s3 import get_endpoint_bucket_key
+
+
+class TestCopytoolS3(unittest.TestCase):
+    """Unit tests for s3 copytool."""
+
+    def test_get_endpoint_bucket_key(self):
+        """Make sure that the endpoint, bucket and key are extracted correctly from the SURL."""
+        surl = 's3://s3.cern.ch:443//atlas-eventservice/EventService_premerge_24706191-5013009653-24039149400-322-5.tar'
+        self.assertEqual(get_endpoint_bucket_key(surl),
+                         ('s3://s3.cern.ch:443', 'atlas-eventservice', 'EventService_premerge_24706191-5013009653-24039149400-322-5.tar'))
+
+        # repeated slashes are collapsed everywhere in the path
+        self.assertEqual(get_endpoint_bucket_key('s3://host//bucket//key/a//b'), ('s3://host', 'bucket', 'key/a/b'))
+
+        # the key is empty if only the bucket is given
+        self.assertEqual(get_endpoint_bucket_key('s3://host/bucket'), ('s3://host', 'bucket', ''))
+
+    def test_resolve_surl_pandaid(self):
+        """Make sure that the PanDA ID is inserted into the dataset, and that a missing PANDAID is an error."""
+        fspec = SimpleNamespace(ddmendpoint='OS_LOGS', dataset='logs_#{pandaid}', lfn='log.tgz', scope='user')
+        ddmconf = {'OS_LOGS': SimpleNamespace(is_deterministic=False, type='OS_LOGS')}
+        protocol = {'endpoint': 's3://host:443/', 'path': '/bucket', 'id': 1}
+
+        with mock.patch.object(s3.infosys, 'pandaqueue', 'QUEUE', create=True), \
+                mock.patch.dict(os.environ, {'PANDAID': '1234'}):
+            self.assertEqual(s3.resolve_surl(fspec, protocol, ddmconf), {'surl': 's3://host:443//bucket/QUEUE/logs_1234'})
+
+        with mock.patch.dict(os.environ):
+            os.environ.pop('PANDAID', None)
+            with self.assertRaises(PilotException) as context:
+                s3.resolve_surl(fspec, protocol, ddmconf)
+        self.assertIn('PANDAID is not set', str(context.exception))
+
+
+class TestCopytoolS3CopyOutExtend(unittest.TestCase):
+    """Unit tests for the log file upload in copy_out_extend()."""
+
+    def setUp(self):
+        """Create a work directory with a few log files."""
+        self.workdir = tempfile.mkdtemp()
+        for name in ('payload.stdout', 'payload.stderr', 'pilotlog.txt'):
+            with open(os.path.join(self.workdir, name), 'w', encoding='utf-8') as _file:
+                _file.write(name)
+
+    def tearDown(self):
+        """Remove the work directory."""
+        shutil.rmtree(self.workdir)
+
+    @staticmethod
+    def get_fspec(lfn):
+        """Return a minimal file spec."""
+        return SimpleNamespace(lfn=lfn, turl='s3://host//bucket/logs', status=None, status_code=0)
+
+    def test_failed_upload_raises_after_all_uploads(self):
+        """Make sure that all log files are uploaded and that the first failure is raised afterwards."""
+        uploaded = []
+
+        def upload_file(path, full_url):
+            uploaded.append(os.path.basename(path))
+            if path.endswith('payload.stderr'):
+                return False, 'timeout', ''
+            return True, '', ''
+
+        fspec = self.get_fspec('log.tgz')
+        with mock.patch.object(s3, 'upload_file', side_effect=upload_file):
+            with self.assertRaises(PilotException) as context:
+                s3.copy_out_extend([fspec], workdir=self.workdir)
+
+        self.assertEqual(sorted(uploaded), ['payload.stderr', 'payload.stdout', 'pilotlog.txt'])
+        self.assertEqual(fspec.status, 'failed')
+        self.assertEqual(context.exception.get_error_code(), fspec.status_code)
+
+    def test_failed_output_file_upload_raises(self):
+        """Make sure that a failed upload of a normal output file raises."""
+        fspec = self.get_fspec('pilotlog.txt')
+        with mock.patch.object(s3, 'upload_file', return_value=(False, 'some error', '')):
+            with self.assertRaises(PilotException):
+                s3.copy_out_extend([fspec], workdir=self.workdir)
+        self.assertEqual(fspec.status, 'failed')
+
+    def test_missing_file_is_not_fatal(self):
+        """Make sure that a missing local file only sets the file status."""
+        fspec = self.get_fspec('missing.txt')
+        with mock.patch.object(s3, 'upload_file') as upload_file:
+            s3.copy_out_extend([fspec], workdir=self.workdir)
+        upload_file.assert_not_called()
+        self.assertEqual(fspec.status, 'failed')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -23,12 +23,16 @@
 """Unit tests for the esprocess package."""
 
 import logging
+import pickle
 import sys
 import unittest
+import weakref
 
-from pilot.common.exception import RunPayloadFailure, PilotException
+from pilot.common.errorcodes import ErrorCodes
+from pilot.common.exception import RunPayloadFailure, PilotException, StageInFailure
 
 logging.basicConfig(stream=sys.stderr, level=logging.DEBUG)
+errors = ErrorCodes()
 
 
 class TestException(unittest.TestCase):
@@ -49,3 +53,50 @@ class TestException(unittest.TestCase):
             self.assertIsInstance(exc, PilotException)
             self.assertEqual(exc.get_error_code(), 1305)
             logging.info(f"\nException: error code: {exc.get_error_code()}\n\nMain message: {exc}\n\nFullStack: {exc.get_detail()}")
+
+    def test_error_code(self):
+        """Make sure that the error code is set from the class or from the code argument."""
+        exc = StageInFailure("Test message")
+        self.assertEqual(exc.get_error_code(), errors.STAGEINFAILED)
+        self.assertEqual(exc.get_last_error(), "Test message")
+        self.assertIn("details: Test message", str(exc))
+
+        exc = PilotException("Test message", code=errors.NOLOCALSPACE)
+        self.assertEqual(exc.get_error_code(), errors.NOLOCALSPACE)
+        self.assertIn(errors.get_error_message(errors.NOLOCALSPACE), str(exc))
+
+        exc = PilotException("Test message")
+        self.assertEqual(exc.get_error_code(), errors.UNKNOWNEXCEPTION)
+
+    def test_pickle(self):
+        """Make sure that exceptions can be pickled, including the keyword arguments."""
+        try:
+            raise ValueError("original error")
+        except ValueError:
+            exc = StageInFailure("Test message", code=errors.NOLOCALSPACE)
+
+        exc = pickle.loads(pickle.dumps(exc))
+        self.assertIsInstance(exc, StageInFailure)
+        self.assertEqual(exc.args, ("Test message",))
+        self.assertEqual(exc.get_error_code(), errors.NOLOCALSPACE)
+
+    def test_stack_trace(self):
+        """Make sure that the stack trace is kept, but not the frames and local variables of the handled exception."""
+        class Payload:
+            """Object only referenced by a local variable of the failing function."""
+
+        def fail():
+            payload = Payload()
+            fail.payload = weakref.ref(payload)
+            raise ValueError("original error")
+
+        try:
+            fail()
+        except ValueError:
+            exc = StageInFailure("Test message")
+
+        self.assertIsNone(fail.payload())  # the frame of fail() has been released
+        self.assertIn("ValueError: original error", exc.stack_trace)
+        self.assertIn('raise ValueError("original error")', exc.get_detail())
+
+        self.assertEqual(StageInFailure("Test message").stack_trace, "")
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Unit tests for the pilot heartbeat functions."""
+
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from pilot.util import heartbeat
+
+
+class TestHeartbeat(unittest.TestCase):
+    """Unit tests for the heartbeat file handling."""
+
+    def setUp(self):
+        """Use an empty directory as PILOT_HOME and reset the heartbeat cache."""
+        self.pilot_home = tempfile.mkdtemp()
+        patcher = mock.patch.dict(os.environ, {'PILOT_HOME': self.pilot_home})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        heartbeat._heartbeat_cache['path'] = None
+        self.path = heartbeat.get_heartbeat_path()
+
+    def tearDown(self):
+        """Remove the heartbeat directory and reset the heartbeat cache."""
+        heartbeat._heartbeat_cache['path'] = None
+        shutil.rmtree(self.pilot_home)
+
+    def write_file(self, dictionary):
+        """Write the heartbeat file behind the back of the heartbeat module, with a new mtime."""
+        stat = os.stat(self.path)
+        with open(self.path, 'w', encoding='utf-8') as _file:
+            json.dump(dictionary, _file)
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+
+    def test_get_last_update(self):
+        """Make sure that get_last_update() returns the last pilot and server updates, and 0 without a file."""
+        self.assertEqual(heartbeat.get_last_update(), 0)
+        self.assertEqual(heartbeat.get_last_update(name='server'), 0)
+
+        self.assertTrue(heartbeat.update_pilot_heartbeat(1000.5))
+        self.assertTrue(heartbeat.update_pilot_heartbeat(2000, name='server'))
+        self.assertEqual(heartbeat.get_last_update(), 1000)
+        self.assertEqual(heartbeat.get_last_update(name='server'), 2000)
+
+    def test_update_pilot_heartbeat(self):
+        """Make sure that the heartbeat file contains the updated fields."""
+        heartbeat.update_pilot_heartbeat(1000)
+        heartbeat.update_pilot_heartbeat(1300, detected_job_suspension=True, time_since_detection=60)
+
+        with open(self.path, 'r', encoding='utf-8') as _file:
+            dictionary = json.load(_file)
+        self.assertEqual(dictionary, {'max_diff_time': 300, 'last_pilot_update': 1300, 'time_since_detection': 60})
+        self.assertEqual(heartbeat.read_pilot_heartbeat(self.path), dictionary)
+
+    def test_atomic_write(self):
+        """Make sure that the file is written to a temporary file that is moved into place."""
+        heartbeat.update_pilot_heartbeat(1000)
+
+        with mock.patch.object(heartbeat.os, 'replace', wraps=os.replace) as replace:
+            self.assertTrue(heartbeat.update_pilot_heartbeat(1100))
+        replace.assert_called_once_with(self.path + '.tmp', self.path)
+        self.assertFalse(os.path.exists(self.path + '.tmp'))
+
+        # a failed move leaves the previous file intact
+        with mock.patch.object(heartbeat.os, 'replace', side_effect=OSError('no space left')):
+            self.assertFalse(heartbeat.update_pilot_heartbeat(1200))
+        heartbeat._heartbeat_cache['path'] = None
+        self.assertEqual(heartbeat.get_last_update(), 1100)
+
+    def test_cache(self):
+        """Make sure that the file is only parsed again after it has been changed."""
+        heartbeat.update_pilot_heartbeat(1000)
+
+        # the dictionary cached by the write is used, the file is not parsed
+        with mock.patch.object(heartbeat, 'read_json') as read_json:
+            self.assertEqual(heartbeat.get_last_update(), 1000)
+        read_json.assert_not_called()
+
+        # a write through the heartbeat module updates the cache
+        heartbeat.update_pilot_heartbeat(1100)
+        with mock.patch.object(heartbeat, 'read_json') as read_json:
+            self.assertEqual(heartbeat.get_last_update(), 1100)
+        read_json.assert_not_called()
+
+        # a file changed by someone else (new mtime and size) is parsed again
+        self.write_file({'last_pilot_update': 123456, 'time_since_detection': 0})
+        self.assertEqual(heartbeat.get_last_update(), 123456)
+
+        # returned dictionaries are copies, modifying them does not change the cache
+        heartbeat.read_pilot_heartbeat(self.path)['last_pilot_update'] = 0
+        self.assertEqual(heartbeat.get_last_update(), 123456)
+
+    def test_is_suspended(self):
+        """Make sure that a pilot is considered suspended if the last pilot update is too old."""
+        self.assertFalse(heartbeat.is_suspended())
+        heartbeat.update_pilot_heartbeat(time.time())
+        self.assertFalse(heartbeat.is_suspended())
+        heartbeat.update_pilot_heartbeat(time.time() - 3600)
+        self.assertTrue(heartbeat.is_suspended())
+
+
+if __name__ == '__main__':
+    unittest.main()
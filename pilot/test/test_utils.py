@@ -21,10 +21,16 @@
 
 """Unit tests for pilot utils."""
 
+import io
 import os
+import tempfile
 import unittest
 
 from pilot.info import infosys
+from pilot.util.filehandling import (
+    ChecksumReader,
+    calculate_checksum
+)
 from pilot.util.workernode import (
     collect_workernode_info,
     get_disk_space
@@ -73,5 +79,77 @@ class TestUtils(unittest.TestCase):
         self.assertEqual(type(diskspace), int)
 
 
+class TestChecksumReader(unittest.TestCase):
+    """Unit tests for the ChecksumReader file object wrapper."""
+
+    def setUp(self):
+        """Create a test file with a known content."""
+        self.data = os.urandom(100000)
+        _fd, self.path = tempfile.mkstemp()
+        with os.fdopen(_fd, 'wb') as _file:
+            _file.write(self.data)
+
+    def tearDown(self):
+        """Remove the test file."""
+        os.remove(self.path)
+
+    def read_all(self, reader, blocksize=4096):
+        """Read the wrapped file until EOF."""
+        while reader.read(blocksize):
+            pass
+
+    def test_full_read_matches_calculate_checksum(self):
+        """Verify that the checksum of a full read is identical to calculate_checksum() (adler32 and md5)."""
+        for algorithm in ('adler32', 'md5'):
+            with open(self.path, 'rb') as _file:
+                reader = ChecksumReader(_file, algorithm=algorithm)
+                self.read_all(reader)
+            self.assertEqual(reader.get_checksum(len(self.data)), calculate_checksum(self.path, algorithm=algorithm))
+
+    def test_single_read(self):
+        """Verify that a single read of the whole file gives the correct checksum."""
+        with open(self.path, 'rb') as _file:
+            reader = ChecksumReader(_file)
+            self.assertEqual(reader.read(), self.data)
+        self.assertEqual(reader.get_checksum(len(self.data)), calculate_checksum(self.path))
+
+    def test_rewind_and_reread(self):
+        """Verify that data read again after a seek back (e.g. a retried transfer) is only hashed once."""
+        with open(self.path, 'rb') as _file:
+            reader = ChecksumReader(_file)
+            reader.read(60000)
+            reader.seek(0)
+            reader.read(1000)
+            reader.seek(-500, os.SEEK_CUR)
+            self.read_all(reader)
+        self.assertEqual(reader.get_checksum(len(self.data)), calculate_checksum(self.path))
+
+    def test_skipped_data_invalidates_checksum(self):
+        """Verify that the checksum is invalidated if data is skipped with a seek forward."""
+        with open(self.path, 'rb') as _file:
+            reader = ChecksumReader(_file)
+            reader.read(1000)
+            reader.seek(2000)
+            self.read_all(reader)
+            self.assertEqual(reader.get_checksum(len(self.data)), "")
+
+            # reading the skipped range afterwards does not make the checksum valid again
+            reader.seek(0)
+            self.read_all(reader)
+        self.assertEqual(reader.get_checksum(len(self.data)), "")
+
+    def test_incomplete_read(self):
+        """Verify that no checksum is returned if the file has not been read completely."""
+        reader = ChecksumReader(io.BytesIO(self.data))
+        reader.read(len(self.data) - 1)
+        self.assertEqual(reader.get_checksum(len(self.data)), "")
+        self.assertEqual(reader.tell(), len(self.data) - 1)
+
+    def test_unknown_algorithm(self):
+        """Verify that an unknown algorithm raises NotImplementedError."""
+        with self.assertRaises(NotImplementedError):
+            ChecksumReader(io.BytesIO(self.data), algorithm='sha1')
+
+
 if __name__ == '__main__':
     unittest.main()
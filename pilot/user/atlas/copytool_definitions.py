@@ -21,6 +21,9 @@
 
 from hashlib import md5
 
+# the pilot only moves the output to a local directory (the aCT moves it to the final destination)
+MV_TO_FINAL_DESTINATION = False
+
 
 def mv_to_final_destination():
     """
@@ -30,7 +33,7 @@ def mv_to_final_destination():
     :return: Boolean.
     """
 
-    return False
+    return MV_TO_FINAL_DESTINATION
 
 
 def get_path(scope, lfn):
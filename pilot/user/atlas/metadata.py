@@ -21,13 +21,16 @@
 
 import os
 import logging
-from xml.dom import minidom
 from xml.etree import ElementTree
+from xml.sax.saxutils import escape
 
 from pilot.util.filehandling import write_file
 
 logger = logging.getLogger(__name__)
 
+# escaping of attribute values in double quotes (same entities as used by ElementTree)
+ATTRIBUTE_ENTITIES = {'"': '&quot;', '\n': '&#10;', '\r': '&#13;', '\t': '&#09;'}
+
 
 def create_input_file_metadata(file_dictionary, workdir, filename="PoolFileCatalog.xml"):
     """
@@ -54,28 +57,38 @@ def create_input_file_metadata(file_dictionary, workdir, filename="PoolFileCatal
     :return: xml (string)
     """
 
-    # create the file structure
-    data = ElementTree.Element('POOLFILECATALOG')
+    # the structure is flat and fixed, so the (pretty printed) XML is written directly
+    parts = ['<?xml version="1.0" ?>\n<!DOCTYPE POOLFILECATALOG SYSTEM "InMemory">\n<POOLFILECATALOG>\n']
+    for fileid, pfn in file_dictionary.items():
+        parts.append(f'  <File ID="{escape(fileid, ATTRIBUTE_ENTITIES)}">\n'
+                     f'    <physical>\n'
+                     f'      <pfn filetype="ROOT_All" name="{escape(pfn, ATTRIBUTE_ENTITIES)}"/>\n'
+                     f'    </physical>\n'
+                     f'    <logical/>\n'
+                     f'  </File>\n')
+    parts.append('</POOLFILECATALOG>\n')
+
+    # the parts are written (and encoded) one by one, rather than as one large string
+    write_file(os.path.join(workdir, filename), parts, mute=False)
 
-    for fileid in list(file_dictionary.keys()):  # Python 2/3
-        _file = ElementTree.SubElement(data, 'File')
-        _file.set('ID', fileid)
-        _physical = ElementTree.SubElement(_file, 'physical')
-        _pfn = ElementTree.SubElement(_physical, 'pfn')
-        _pfn.set('filetype', 'ROOT_All')
-        _pfn.set('name', file_dictionary.get(fileid))
-        ElementTree.SubElement(_file, 'logical')
+    return ''.join(parts)
 
-    # create a new XML file with the results
-    xml = ElementTree.tostring(data, encoding='utf8')
-    xml = minidom.parseString(xml).toprettyxml(indent="  ")
 
-    # stitch in the DOCTYPE
-    xml = xml.replace('<POOLFILECATALOG>', '<!DOCTYPE POOLFILECATALOG SYSTEM "InMemory">\n<POOLFILECATALOG>')
+def iterate_file_elements(path):
+    """
+    Iterate over the File elements of the given POOLFILECATALOG XML file.
 
-    write_file(os.path.join(workdir, filename), xml, mute=False)
+    The file is parsed incrementally, and each File element is cleared once the caller has processed it,
+    so that the memory usage does not grow with the number of files in the catalog.
 
-    return xml
+    :param path: path to the XML file (string).
+    :return: generator of File elements (Element).
+    """
+
+    for _, element in ElementTree.iterparse(path, events=('end',)):
+        if element.tag == 'File':
+            yield element
+            element.clear()
 
 
 def get_file_info_from_xml(workdir, filename="PoolFileCatalog.xml"):
@@ -107,11 +120,7 @@ def get_file_info_from_xml(workdir, filename="PoolFileCatalog.xml"):
     """
 
     file_info_dictionary = {}
-    tree = ElementTree.parse(os.path.join(workdir, filename))
-    root = tree.getroot()
-    # root.tag = POOLFILECATALOG
-
-    for child in root:
+    for child in iterate_file_elements(os.path.join(workdir, filename)):
         # child.tag = 'File', child.attrib = {'ID': '4ACC5018-2EA3-B441-BC11-0C0992847FD1'}
         guid = child.attrib['ID']
         for grandchild in child:
@@ -165,11 +174,7 @@ def get_metadata_from_xml(workdir, filename="metadata.xml"):
         logger.warning(f'file does not exist: {path}')
         return metadata_dictionary
 
-    tree = ElementTree.parse(path)
-    root = tree.getroot()
-    # root.tag = POOLFILECATALOG
-
-    for child in root:
+    for child in iterate_file_elements(path):
         # child.tag = 'File', child.attrib = {'ID': '4ACC5018-2EA3-B441-BC11-0C0992847FD1'}
         lfn = ""
         guid = child.attrib['ID'] if 'ID' in child.attrib else None
@@ -225,10 +230,14 @@ def get_total_number_of_events(metadata_dictionary):
     """
 
     nevents = 0
-    for filename in metadata_dictionary:
-        _nevents = get_number_of_events(metadata_dictionary, filename=filename)
-        if _nevents != -1:
-            nevents += _nevents
+    for metadata in metadata_dictionary.values():
+        _nevents = metadata.get('events')
+        if _nevents is None:  # no events entry for this file
+            continue
+        try:
+            nevents += int(_nevents)
+        except ValueError as exc:
+            logger.warning(f'failed to convert number of events to int: {exc}')
 
     return nevents
 
@@ -260,12 +269,7 @@ def get_guid_from_xml(metadata_dictionary, lfn):
 
     :param metadata_dictionary: dictionary from parsed metadata.xml file.
     :param lfn: LFN (string).
-    :return: total number of processed events (int).
+    :return: guid (string, None is returned if the LFN is not in the dictionary).
     """
 
-    guid = None
-    for filename in metadata_dictionary:
-        if filename == lfn:
-            guid = get_guid(metadata_dictionary, filename=filename)
-
-    return guid
+    return get_guid(metadata_dictionary, filename=lfn) if lfn in metadata_dictionary else None
@@ -21,7 +21,6 @@
 
 import os
 import re
-import glob
 from datetime import datetime
 from time import sleep
 
@@ -29,9 +28,8 @@ from pilot.common.errorcodes import ErrorCodes
 from pilot.common.exception import NoSoftwareDir
 from pilot.info import infosys
 from pilot.util.auxiliary import find_pattern_in_list
-from pilot.util.container import execute
-from pilot.util.filehandling import read_file, write_file, copy, head
-from pilot.util.https import download_file
+from pilot.util.filehandling import copy, head
+from pilot.util.https import download_file_to
 from .metadata import get_file_info_from_xml
 
 import logging
@@ -39,6 +37,27 @@ logger = logging.getLogger(__name__)
 
 errors = ErrorCodes()
 
+ATLAS_PREFIX_PATTERN = re.compile(r'^Atlas-')  # prefix of standard ATLAS release strings
+ANALYSIS_TRANSFORMS_PREFIX_PATTERN = re.compile(r'^AnalysisTransforms-*')  # prefix of user analysis homePackages
+RELEASE_PATTERN = re.compile(r'^\d+\.\d+\.\d+$')  # e.g. 21.0.15
+SETUP_TIME_PATTERN = re.compile(r'(\d{2}\:\d{2}\:\d{2}\ \d{4}\/\d{2}\/\d{2})')  # date time in the payload stdout
+
+VALID_BASE_URLS = ("http://www.usatlas.bnl.gov",
+                   "https://www.usatlas.bnl.gov",
+                   "http://pandaserver.cern.ch",
+                   "http://atlpan.web.cern.ch/atlpan",
+                   "https://atlpan.web.cern.ch/atlpan",
+                   "http://classis01.roma1.infn.it",
+                   "http://atlas-install.roma1.infn.it")  # known download locations for user analysis transforms
+
+TRF_DOWNLOAD_RETRY_DELAY = 5  # initial delay before retrying a failed transform download, tripled for each retry
+TRF_DOWNLOAD_MAX_RETRY_DELAY = 45  # maximum delay before retrying a failed transform download
+PERMANENT_HTTP_ERRORS = (404, 410)  # HTTP errors for which a transform download is not retried
+
+verified_alrb_paths = set()  # ALRB paths that are known to exist (CVMFS paths do not disappear during the run)
+failed_transform_urls = set()  # transform URLs that returned a permanent HTTP error
+queuedata_appdir = None  # appdir from queuedata, once resolved (see get_queuedata_appdir())
+
 
 def get_file_system_root_path():
     """
@@ -92,15 +111,41 @@ def get_alrb_export(add_if=False):
     """
 
     path = f"{get_file_system_root_path()}/atlas.cern.ch/repo"
-    cmd = f"export ATLAS_LOCAL_ROOT_BASE={path}/ATLASLocalRootBase;" if os.path.exists(path) else ""
+    # only the existence is remembered, a missing path is checked again (e.g. in case CVMFS was not mounted yet)
+    if path not in verified_alrb_paths:
+        if not os.path.exists(path):
+            return ""
+        verified_alrb_paths.add(path)
+    cmd = f"export ATLAS_LOCAL_ROOT_BASE={path}/ATLASLocalRootBase;"
 
     # if [ -z "$ATLAS_LOCAL_ROOT_BASE" ]; then export ATLAS_LOCAL_ROOT_BASE=/cvmfs/atlas.cern.ch/repo/ATLASLocalRootBase; fi;
-    if cmd and add_if:
+    if add_if:
         cmd = 'if [ -z \"$ATLAS_LOCAL_ROOT_BASE\" ]; then ' + cmd + ' fi;'
 
     return cmd
 
 
+def get_queuedata_appdir():
+    """
+    Return the appdir from queuedata.
+
+    The value is remembered once queuedata has been resolved, since queuedata does not change during the run.
+    An empty string is returned (and nothing is remembered) if infosys has not been initiated yet.
+
+    :return: appdir (string).
+    """
+
+    global queuedata_appdir  # pylint: disable=global-statement
+
+    if queuedata_appdir is None:
+        queuedata = getattr(infosys, 'queuedata', None)
+        if queuedata is None:
+            return ""
+        queuedata_appdir = queuedata.appdir or ""
+
+    return queuedata_appdir
+
+
 def get_asetup(asetup=True, alrb=False, add_if=False):
     """
     Define the setup for asetup, i.e. including full path to asetup and setting of ATLAS_LOCAL_ROOT_BASE
@@ -123,13 +168,8 @@ def get_asetup(asetup=True, alrb=False, add_if=False):
             if asetup:
                 cmd += "source $AtlasSetup/scripts/asetup.sh"
     else:
-        try:  # use try in case infosys has not been initiated
-            appdir = infosys.queuedata.appdir
-        except Exception:
-            appdir = ""
-        if appdir == "":
-            appdir = os.environ.get('VO_ATLAS_SW_DIR', '')
-        if appdir != "":
+        appdir = get_queuedata_appdir() or os.environ.get('VO_ATLAS_SW_DIR', '')
+        if appdir:
             # make sure that the appdir exists
             if not os.path.exists(appdir):
                 msg = f'appdir does not exist: {appdir}'
@@ -154,13 +194,13 @@ def get_asetup_options(release, homepackage):
     """
 
     asetupopt = []
-    release = re.sub('^Atlas-', '', release)
+    release = ATLAS_PREFIX_PATTERN.sub('', release)
 
     # is it a user analysis homePackage?
     if 'AnalysisTransforms' in homepackage:
 
-        _homepackage = re.sub('^AnalysisTransforms-*', '', homepackage)
-        if _homepackage == '' or re.search(r'^\d+\.\d+\.\d+$', release) is None:
+        _homepackage = ANALYSIS_TRANSFORMS_PREFIX_PATTERN.sub('', homepackage)
+        if _homepackage == '' or RELEASE_PATTERN.search(release) is None:
             if release != "":
                 asetupopt.append(release)
         if _homepackage != '':
@@ -203,18 +243,12 @@ def set_inds(dataset):
     :return:
     """
 
-    inds = ""
-    _dataset = dataset.split(',')
-    for ds in _dataset:
-        if "DBRelease" not in ds and ".lib." not in ds:
-            inds = ds
-            break
-    if inds != "":
+    inds = next((ds for ds in dataset.split(',') if "DBRelease" not in ds and ".lib." not in ds), "")
+    if inds:
         logger.info(f"setting INDS environmental variable to: {inds}")
-        os.environ['INDS'] = inds
     else:
         logger.warning("INDS unknown")
-        os.environ['INDS'] = 'unknown'
+    os.environ['INDS'] = inds or 'unknown'
 
 
 def get_analysis_trf(transform, workdir):
@@ -233,32 +267,23 @@ def get_analysis_trf(transform, workdir):
     # test if $HARVESTER_WORKDIR is set
     harvester_workdir = os.environ.get('HARVESTER_WORKDIR')
     if harvester_workdir is not None:
-        search_pattern = f"{harvester_workdir}/jobO.*.tar.gz"
-        jobopt_files = glob.glob(search_pattern)
-        for jobopt_file in jobopt_files:
+        for jobopt_file in get_jobopt_archives(harvester_workdir):
             try:
                 copy(jobopt_file, workdir)
             except Exception as error:
                 logger.error(f"could not copy file {jobopt_file} to {workdir} : {error}")
 
-    if '/' in transform:
-        transform_name = transform.split('/')[-1]
-    else:
+    transform_name = os.path.basename(transform)
+    if transform_name == transform:
         logger.warning(f'did not detect any / in {transform} (using full transform name)')
-        transform_name = transform
 
     # is the command already available? (e.g. if already downloaded by a preprocess/main process step)
     if os.path.exists(os.path.join(workdir, transform_name)):
         logger.info(f'script {transform_name} is already available - no need to download again')
         return ec, diagnostics, transform_name
 
-    original_base_url = ""
-
     # verify the base URL
-    for base_url in get_valid_base_urls():
-        if transform.startswith(base_url):
-            original_base_url = base_url
-            break
+    original_base_url = next((base_url for base_url in VALID_BASE_URLS if transform.startswith(base_url)), "")
 
     if original_base_url == "":
         diagnostics = f"invalid base URL: {transform}"
@@ -267,7 +292,7 @@ def get_analysis_trf(transform, workdir):
     # try to download from the required location, if not - switch to backup
     status = False
     for base_url in get_valid_base_urls(order=original_base_url):
-        trf = re.sub(original_base_url, base_url, transform)
+        trf = base_url + transform[len(original_base_url):]
         logger.debug(f"attempting to download script: {trf}")
         status, diagnostics = download_transform(trf, transform_name, workdir)
         if status:
@@ -287,6 +312,33 @@ def get_analysis_trf(transform, workdir):
     return ec, diagnostics, transform_name
 
 
+def get_jobopt_archives(directory):
+    """
+    Return the paths to the job options archives (jobO.*.tar.gz) in the given directory.
+
+    :param directory: directory to search (string).
+    :return: list of paths (list).
+    """
+
+    try:
+        with os.scandir(directory) as entries:
+            return [entry.path for entry in entries if is_jobopt_archive(entry.name) and entry.is_file()]
+    except OSError as error:
+        logger.warning(f"could not list {directory}: {error}")
+        return []
+
+
+def is_jobopt_archive(name):
+    """
+    Is the given file name a job options archive, i.e. does it match jobO.*.tar.gz?
+
+    :param name: file name (string).
+    :return: Boolean. Returns True if the name matches.
+    """
+
+    return len(name) >= len('jobO..tar.gz') and name.startswith('jobO.') and name.endswith('.tar.gz')
+
+
 def download_transform(url: str, transform_name: str, workdir: str) -> (bool, str):
     """
     Download the transform from the given url
@@ -315,28 +367,37 @@ def download_transform(url: str, transform_name: str, workdir: str) -> (bool, st
             status = False
         return status, diagnostics
 
+    if url in failed_transform_urls:
+        diagnostics = f'{url} is known to be unavailable'
+        logger.warning(diagnostics)
+        return status, diagnostics
+
     # try to download the trf a maximum of 3 times
     while trial <= max_trials:
         logger.info(f"downloading file {transform_name} [trial {trial}/{max_trials}]")
 
-        content = download_file(url)
         with open(path, "wb+") as _file:  # note: binary mode, so no encoding is needed (or, encoding=None)
-            if content:
-                _file.write(content)
-                logger.info(f'saved data from \"{url}\" resource into file {path}, '
-                            f'length={len(content) / 1024.:.1f} kB')
-                status = True
+            size, http_code = download_file_to(url, _file)
+        if size:
+            logger.info(f'saved data from \"{url}\" resource into file {path}, length={size / 1024.:.1f} kB')
+            status = True
 
         if not status:
             # Analyze exit code / output
             diagnostics = f'no data was downloaded from {url}'
             logger.warning(diagnostics)
+            if http_code in PERMANENT_HTTP_ERRORS:
+                # no point in trying again, the transform is not there
+                logger.warning(f'{url} returned HTTP error {http_code} - will not try again')
+                failed_transform_urls.add(url)
+                break
             if trial == max_trials:
                 logger.fatal(f'could not download transform: {transform_name}')
                 break
             else:
-                logger.info("will try again after 60 s")
-                sleep(60)
+                delay = min(TRF_DOWNLOAD_RETRY_DELAY * 3 ** (trial - 1), TRF_DOWNLOAD_MAX_RETRY_DELAY)
+                logger.info(f"will try again after {delay} s")
+                sleep(delay)
         else:
             logger.info(f"transform {transform_name} downloaded")
             break
@@ -345,92 +406,21 @@ def download_transform(url: str, transform_name: str, workdir: str) -> (bool, st
     return status, diagnostics
 
 
-def download_transform_old(url, transform_name, workdir):
-    """
-    Download the transform from the given url
-    :param url: download URL with path to transform (string).
-    :param transform_name: trf name (string).
-    :param workdir: work directory (string).
-    :return:
-    """
-
-    status = False
-    diagnostics = ""
-    path = os.path.join(workdir, transform_name)
-    cmd = f'curl -sS "{url}" > {path}'
-    trial = 1
-    max_trials = 3
-
-    # test if $HARVESTER_WORKDIR is set
-    harvester_workdir = os.environ.get('HARVESTER_WORKDIR')
-    if harvester_workdir is not None:
-        # skip curl by setting max_trials = 0
-        max_trials = 0
-        source_path = os.path.join(harvester_workdir, transform_name)
-        try:
-            copy(source_path, path)
-            status = True
-        except Exception as error:
-            status = False
-            diagnostics = f"Failed to copy file {source_path} to {path} : {error}"
-            logger.error(diagnostics)
-
-    # try to download the trf a maximum of 3 times
-    while trial <= max_trials:
-        logger.info(f"executing command [trial {trial}/{max_trials}]: {cmd}")
-
-        exit_code, stdout, stderr = execute(cmd, mute=True)
-        if not stdout:
-            stdout = "(None)"
-        if exit_code != 0:
-            # Analyze exit code / output
-            diagnostics = f"curl command failed: {exit_code}, {stdout}, {stderr}"
-            logger.warning(diagnostics)
-            if trial == max_trials:
-                logger.fatal(f'could not download transform: {stdout}')
-                status = False
-                break
-            else:
-                logger.info("will try again after 60 s")
-                sleep(60)
-        else:
-            logger.info(f"curl command returned: {stdout}")
-            status = True
-            break
-        trial += 1
-
-    return status, diagnostics
-
-
 def get_valid_base_urls(order=None):
     """
-    Return a list of valid base URLs from where the user analysis transform may be downloaded from.
+    Return a tuple of valid base URLs from where the user analysis transform may be downloaded from.
     If order is defined, return given item first.
-    E.g. order=http://atlpan.web.cern.ch/atlpan -> ['http://atlpan.web.cern.ch/atlpan', ...]
+    E.g. order=http://atlpan.web.cern.ch/atlpan -> ('http://atlpan.web.cern.ch/atlpan', ...)
     NOTE: the URL list may be out of date.
 
     :param order: order (string).
-    :return: valid base URLs (list).
-    """
-
-    valid_base_urls = []
-    _valid_base_urls = ["http://www.usatlas.bnl.gov",
-                        "https://www.usatlas.bnl.gov",
-                        "http://pandaserver.cern.ch",
-                        "http://atlpan.web.cern.ch/atlpan",
-                        "https://atlpan.web.cern.ch/atlpan",
-                        "http://classis01.roma1.infn.it",
-                        "http://atlas-install.roma1.infn.it"]
-
-    if order:
-        valid_base_urls.append(order)
-        for url in _valid_base_urls:
-            if url != order:
-                valid_base_urls.append(url)
-    else:
-        valid_base_urls = _valid_base_urls
+    :return: valid base URLs (tuple).
+    """
 
-    return valid_base_urls
+    if not order:
+        return VALID_BASE_URLS
+
+    return (order,) + tuple(url for url in VALID_BASE_URLS if url != order)
 
 
 def get_payload_environment_variables(cmd, job_id, task_id, attempt_nr, processing_type, site_name, analysis_job):
@@ -447,35 +437,30 @@ def get_payload_environment_variables(cmd, job_id, task_id, attempt_nr, processi
     :return: list of environment variables needed by the payload.
     """
 
-    variables = []
-    variables.append(f'export PANDA_RESOURCE=\'{site_name}\';')
-    variables.append(f'export FRONTIER_ID="[{task_id}_{job_id}]";')
-    variables.append('export CMSSW_VERSION=$FRONTIER_ID;')
-    variables.append(f"export PandaID={os.environ.get('PANDAID', 'unknown')};")
-    variables.append(f"export PanDA_TaskID='{os.environ.get('PanDA_TaskID', 'unknown')}';")
-    variables.append(f'export PanDA_AttemptNr=\'{attempt_nr}\';')
-    variables.append(f"export INDS='{os.environ.get('INDS', 'unknown')}';")
+    env = os.environ
+    athena_proc_number = env.get('ATHENA_PROC_NUMBER')
+
+    variables = [f'export PANDA_RESOURCE=\'{site_name}\';',
+                 f'export FRONTIER_ID="[{task_id}_{job_id}]";',
+                 'export CMSSW_VERSION=$FRONTIER_ID;',
+                 f"export PandaID={env.get('PANDAID', 'unknown')};",
+                 f"export PanDA_TaskID='{env.get('PanDA_TaskID', 'unknown')}';",
+                 f'export PanDA_AttemptNr=\'{attempt_nr}\';',
+                 f"export INDS='{env.get('INDS', 'unknown')}';"]
 
     # Unset ATHENA_PROC_NUMBER if set for event service Merge jobs
-    if "Merge_tf" in cmd and 'ATHENA_PROC_NUMBER' in os.environ:
-        variables.append('unset ATHENA_PROC_NUMBER;')
-        variables.append('unset ATHENA_CORE_NUMBER;')
+    if "Merge_tf" in cmd and athena_proc_number is not None:
+        variables += ['unset ATHENA_PROC_NUMBER;', 'unset ATHENA_CORE_NUMBER;']
 
     if analysis_job:
-        variables.append('export ROOT_TTREECACHE_SIZE=1;')
-        try:
-            core_count = int(os.environ.get('ATHENA_PROC_NUMBER'))
-        except Exception:
-            _core_count = 'export ROOTCORE_NCPUS=1;'
-        else:
-            _core_count = f'export ROOTCORE_NCPUS={core_count};'
-        variables.append(_core_count)
+        core_count = int(athena_proc_number) if athena_proc_number and athena_proc_number.isdigit() else 1
+        variables += ['export ROOT_TTREECACHE_SIZE=1;', f'export ROOTCORE_NCPUS={core_count};']
 
     if processing_type == "":
         logger.warning("RUCIO_APPID needs job.processingType but it is not set!")
     else:
         variables.append(f'export RUCIO_APPID=\'{processing_type}\';')
-    variables.append(f"export RUCIO_ACCOUNT='{os.environ.get('RUCIO_ACCOUNT', 'pilot')}';")
+    variables.append(f"export RUCIO_ACCOUNT='{env.get('RUCIO_ACCOUNT', 'pilot')}';")
 
     return variables
 
@@ -490,15 +475,8 @@ def get_writetoinput_filenames(writetofile):
     :return: list of file names
     """
 
-    filenames = []
-    entries = writetofile.split('^')
-    for entry in entries:
-        if ':' in entry:
-            name = entry.split(":")[0]
-            name = name.replace('.pool.root.', '.txt.')  # not necessary?
-            filenames.append(name)
-
-    return filenames
+    # (the .pool.root. replacement is probably not necessary)
+    return [entry.partition(':')[0].replace('.pool.root.', '.txt.') for entry in writetofile.split('^') if ':' in entry]
 
 
 def replace_lfns_with_turls(cmd, workdir, filename, infiles, writetofile=""):
@@ -519,35 +497,35 @@ def replace_lfns_with_turls(cmd, workdir, filename, infiles, writetofile=""):
     path = os.path.join(workdir, filename)
     if os.path.exists(path):
         file_info_dictionary = get_file_info_from_xml(workdir, filename=filename)
-        for inputfile in infiles:
-            if inputfile in cmd:
-                turl = file_info_dictionary[inputfile][0]
-                turl_dictionary[inputfile] = turl
-                # if turl.startswith('root://') and turl not in cmd:
-                if turl not in cmd:
-                    cmd = cmd.replace(inputfile, turl)
-                    logger.info(f"replaced '{inputfile}' with '{turl}' in the run command")
+
+        # find all LFNs in the command with a single scan (longest first, in case an LFN is part of another)
+        found = set()
+        if infiles:
+            pattern = re.compile('|'.join(re.escape(lfn) for lfn in sorted(set(infiles), key=len, reverse=True)))
+            found = set(pattern.findall(cmd))
+
+        replacements = {}  # { LFN: TURL, ..} for the LFNs that should be replaced in the command
+        for inputfile in found:
+            turl = file_info_dictionary[inputfile][0]
+            turl_dictionary[inputfile] = turl
+            # if turl.startswith('root://') and turl not in cmd:
+            if turl not in cmd:
+                replacements[inputfile] = turl
+
+        # replace all LFNs in one pass, so that an LFN that is part of an already inserted TURL is not replaced again
+        if replacements:
+            pattern = re.compile('|'.join(re.escape(lfn) for lfn in sorted(replacements, key=len, reverse=True)))
+            cmd = pattern.sub(lambda match: replacements[match.group(0)], cmd)
+            for inputfile, turl in replacements.items():
+                logger.info(f"replaced '{inputfile}' with '{turl}' in the run command")
 
         # replace the LFNs with TURLs in the writetofile input file list (if it exists)
         if writetofile and turl_dictionary:
             filenames = get_writetoinput_filenames(writetofile)
             for fname in filenames:
-                new_lines = []
                 path = os.path.join(workdir, fname)
                 if os.path.exists(path):
-                    f = read_file(path)
-                    for line in f.split('\n'):
-                        fname = os.path.basename(line)
-                        if fname in turl_dictionary:
-                            turl = turl_dictionary[fname]
-                            new_lines.append(turl)
-                        else:
-                            if line:
-                                new_lines.append(line)
-
-                    lines = '\n'.join(new_lines)
-                    if lines:
-                        write_file(path, lines)
+                    replace_lfns_in_file(path, turl_dictionary)
                 else:
                     logger.warning(f"file does not exist: {path}")
     else:
@@ -556,14 +534,45 @@ def replace_lfns_with_turls(cmd, workdir, filename, infiles, writetofile=""):
     return cmd
 
 
-def get_end_setup_time(path, pattern=r'(\d{2}\:\d{2}\:\d{2}\ \d{4}\/\d{2}\/\d{2})'):
+def replace_lfns_in_file(path, turl_dictionary):
+    """
+    Replace the LFNs with TURLs in the given input file list.
+
+    The file is streamed line by line into a temporary file that replaces the original, so the file content is never
+    held in memory. Empty lines are dropped and the file is left untouched if it has no non-empty lines.
+
+    :param path: path to input file list (string).
+    :param turl_dictionary: { LFN: TURL, ..} (dictionary).
+    """
+
+    tmp_path = path + '.tmp'
+    try:
+        with open(path, 'r', encoding='utf-8') as fin, open(tmp_path, 'w', encoding='utf-8') as fout:
+            separator = ''
+            for line in fin:
+                line = line.rstrip('\n')
+                if not line:
+                    continue
+                fname = os.path.basename(line) if '/' in line else line
+                fout.write(separator + turl_dictionary.get(fname, line))
+                separator = '\n'
+        if separator:
+            os.replace(tmp_path, path)
+    except OSError as exc:
+        logger.warning(f"failed to replace LFNs with TURLs in {path}: {exc}")
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def get_end_setup_time(path, pattern=SETUP_TIME_PATTERN):
     """
     Extract a more precise end of setup time from the payload stdout.
     File path should be verified already.
     The function will look for a date time in the beginning of the payload stdout with the given pattern.
 
     :param path: path to payload stdout (string).
-    :param pattern: regular expression pattern (raw string).
+    :param pattern: regular expression pattern (raw string or compiled pattern).
     :return: time in seconds since epoch (float).
     """
 
@@ -623,4 +632,4 @@ def should_verify_setup(job):
     :return: Boolean.
     """
 
-    return True if job.swrelease and job.swrelease != 'NULL' else False
+    return bool(job.swrelease) and job.swrelease != 'NULL'
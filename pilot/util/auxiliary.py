@@ -648,7 +648,7 @@ def find_pattern_in_list(input_list: list, pattern: str) -> str:
     Search for the given pattern in the input list.
 
     :param input_list: list of strings (list)
-    :param pattern: regular expression pattern (raw str)
+    :param pattern: regular expression pattern (raw str or compiled pattern)
     :return: found string (str or None).
     """
     found = None
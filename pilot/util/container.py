@@ -44,24 +44,32 @@ errors = ErrorCodes()
 execute_lock = threading.Lock()
 
 
-def execute(executable: Any, **kwargs: dict) -> Any:
+def execute(executable: Any, **kwargs: dict) -> Any:  # noqa: C901
     """
     Execute the command with its options in the provided executable list using subprocess time-out handler.
 
     The function also determines whether the command should be executed within a container.
 
+    If the executable is a list and shell=False is given, the command is executed directly (without bash), unless
+    it has to be executed within a container. In that case the arguments are quoted before being passed to the shell.
+
     :param executable: command to be executed (str or list)
     :param kwargs: kwargs (dict)
     :return: exit code (int), stdout (str) and stderr (str) (or process if requested via returnproc argument).
     """
     usecontainer = kwargs.get('usecontainer', False)
     job = kwargs.get('job')
-    #shell = kwargs.get("shell", False)
+    shell = kwargs.get('shell', True)
     obscure = kwargs.get('obscure', '')  # if this string is set, hide it in the log message
 
-    # convert executable to string if it is a list
+    # convert executable to string if it is a list (the list is kept as the argument vector if shell is not used)
+    argv = None
     if isinstance(executable, list):
-        executable = ' '.join(executable)
+        if shell:
+            executable = ' '.join(executable)
+        else:
+            argv = executable
+            executable = ' '.join(shlex.quote(arg) for arg in argv)
 
     # switch off pilot controlled containers for user defined containers
     if job and job.imagename != "" and "runcontainer" in executable:
@@ -71,6 +79,7 @@ def execute(executable: Any, **kwargs: dict) -> Any:
     # Import user specific code if necessary (in case the command should be executed in a container)
     # Note: the container.wrapper() function must at least be declared
     if usecontainer:
+        argv = None
         executable, diagnostics = containerise_executable(executable, **kwargs)
         if not executable:
             return None if kwargs.get('returnproc', False) else -1, "", diagnostics
@@ -81,7 +90,10 @@ def execute(executable: Any, **kwargs: dict) -> Any:
     # always use a timeout to prevent stdout buffer problem in nodes with lots of cores
     timeout = get_timeout(kwargs.get('timeout', None))
 
-    exe = ['/usr/bin/python'] + executable.split() if kwargs.get('mode', 'bash') == 'python' else ['/bin/bash', '-c', executable]
+    if argv:
+        exe = argv
+    else:
+        exe = ['/usr/bin/python'] + executable.split() if kwargs.get('mode', 'bash') == 'python' else ['/bin/bash', '-c', executable]
 
     # try: intercept exception such as OSError -> report e.g. error.RESOURCEUNAVAILABLE: "Resource temporarily unavailable"
     exit_code = 0
@@ -25,9 +25,11 @@ import fnmatch
 import hashlib
 import io
 import logging
+import mmap
 import os
 import re
 import subprocess
+import sys
 import tarfile
 import time
 import uuid
@@ -37,7 +39,6 @@ from functools import partial, reduce
 from glob import glob
 from json import load, JSONDecodeError
 from json import dump as dumpjson
-from mmap import mmap
 from pathlib import Path
 from shutil import copy2, rmtree
 from typing import Any, IO, Union, Mapping, Iterable
@@ -50,6 +51,13 @@ from .math import diff_lists
 
 logger = logging.getLogger(__name__)
 
+# read block size used when streaming files through hashlib checksum algorithms (1 MB, the buffer is reused for all blocks)
+CHECKSUM_BLOCK_SIZE = 1024 * 1024
+# read buffer size used for adler32 checksums (1 MB, the buffer is reused for all blocks)
+ADLER32_BLOCK_SIZE = 1024 * 1024
+# files at least this large are memory-mapped for adler32 checksums on 64-bit platforms (64 MB)
+MMAP_MIN_SIZE = 64 * 1024 * 1024
+
 
 def get_pilot_work_dir(workdir: str) -> str:
     """
@@ -120,6 +128,7 @@ def write_file(path: str, contents: Any, mute: bool = True, mode: str = 'w', uni
     Write the given contents to a file.
 
     If unique=True, then if the file already exists, an index will be added (e.g. 'out.txt' -> 'out-1.txt')
+    The contents can also be given as a list of strings, which are written one by one (without joining them first).
 
     :param path: full path for file (str)
     :param contents: file contents (Any)
@@ -138,7 +147,10 @@ def write_file(path: str, contents: Any, mute: bool = True, mode: str = 'w', uni
     _file = open_file(path, mode)
     if _file:
         try:
-            _file.write(contents)
+            if isinstance(contents, list):
+                _file.writelines(contents)
+            else:
+                _file.write(contents)
         except IOError as exc:
             raise FileHandlingFailure(exc) from exc
         else:
@@ -753,18 +765,13 @@ def calculate_checksum(filename: str, algorithm: str = "adler32") -> str:
     if not os.path.exists(filename):
         raise FileHandlingFailure(f'file does not exist: {filename}')
 
-    if algorithm == 'adler32' or algorithm == 'adler' or algorithm == 'ad' or algorithm == 'ad32':
-        try:
-            checksum = calculate_adler32_checksum(filename)
-        except Exception as exc:
-            raise exc
-        return checksum
-    elif algorithm == 'md5' or algorithm == 'md5sum' or algorithm == 'md':
+    if algorithm in {'adler32', 'adler', 'ad', 'ad32'}:
+        return calculate_adler32_checksum(filename)
+    if algorithm in {'md5', 'md5sum', 'md'}:
         return calculate_md5_checksum(filename)
-    else:
-        msg = f'unknown checksum algorithm: {algorithm}'
-        logger.warning(msg)
-        raise NotImplementedError()
+
+    logger.warning(f'unknown checksum algorithm: {algorithm}')
+    raise NotImplementedError()
 
 
 def calculate_adler32_checksum(filename: str) -> str:
@@ -775,6 +782,11 @@ def calculate_adler32_checksum(filename: str) -> str:
     into a 32-bit integer. A is the sum of all bytes in the stream plus one, and B is the sum of the individual values
     of A from each step.
 
+    Large files (MMAP_MIN_SIZE) are memory-mapped and passed to zlib.adler32() in one call, which avoids the
+    copy into user space and lets the kernel read ahead. Otherwise, or if the file can not be mapped, the file is
+    read without Python-level buffering into a single preallocated buffer (ADLER32_BLOCK_SIZE), so that no new bytes
+    object is created per block and the time is spent in the C-level zlib.adler32() call.
+
     :param filename: file name (str)
     :raises: Exception.
     :returns: hexadecimal string, padded to 8 values (str).
@@ -783,24 +795,17 @@ def calculate_adler32_checksum(filename: str) -> str:
     adler = 1
 
     try:
-        with open(filename, 'r+b') as _file:
-            _mm = mmap(_file.fileno(), 0)
-            for block in iter(partial(_mm.read, io.DEFAULT_BUFFER_SIZE), b''):
-                adler = adler32(block, adler)
+        with open(filename, 'rb', buffering=0) as _file:
+            checksum = calculate_adler32_mmap(_file.fileno())
+            if checksum is not None:
+                adler = checksum
+            else:
+                buffer = bytearray(ADLER32_BLOCK_SIZE)
+                view = memoryview(buffer)
+                for nbytes in iter(partial(_file.readinto, buffer), 0):
+                    adler = adler32(view[:nbytes], adler)
     except Exception as exc:
-        logger.warning(f'failed to get adler32 checksum for file {filename} - {exc} (attempting alternative)')
-        try:
-            adler = 1  # default adler32 starting value
-            blocksize = 64 * 1024 * 1024  # read buffer size, 64 Mb
-
-            with open(filename, 'rb') as _file:
-                while True:
-                    data = _file.read(blocksize)
-                    if not data:
-                        break
-                    adler = adler32(data, adler)
-        except Exception as exc:
-            raise Exception(f'failed to get adler32 checksum for file {filename} - {exc} (tried alternative)')
+        raise Exception(f'failed to get adler32 checksum for file {filename} - {exc}') from exc
 
     # backflip on 32bit
     if adler < 0:
@@ -810,25 +815,139 @@ def calculate_adler32_checksum(filename: str) -> str:
     return f"{adler:08x}"
 
 
+def calculate_adler32_mmap(fileno: int) -> int or None:
+    """
+    Calculate the adler32 checksum of a large file by memory-mapping it.
+
+    Only used for files of at least MMAP_MIN_SIZE on 64-bit platforms (where the address space is not a concern).
+
+    :param fileno: file descriptor of a file opened for reading (int)
+    :return: adler32 checksum, None if the file is too small or could not be mapped (int or None).
+    """
+    if sys.maxsize <= 2 ** 32 or os.fstat(fileno).st_size < MMAP_MIN_SIZE:
+        return None
+
+    try:
+        with mmap.mmap(fileno, 0, access=mmap.ACCESS_READ) as mapped:
+            if hasattr(mmap, 'MADV_SEQUENTIAL'):  # Python 3.8+, not on all platforms
+                mapped.madvise(mmap.MADV_SEQUENTIAL)
+            return adler32(mapped, 1)
+    except (OSError, ValueError) as exc:
+        logger.debug(f'failed to memory-map file, will read it instead: {exc}')
+
+    return None
+
+
 def calculate_md5_checksum(filename: str):
     """
     Calculate the md5 checksum for the given file.
 
-    The file is assumed to exist.
+    The file is assumed to exist. hashlib.file_digest() is used when available (Python 3.11+), otherwise the
+    file is read without Python-level buffering into a single preallocated buffer (CHECKSUM_BLOCK_SIZE).
+    In both cases the hashing is done by the OpenSSL implementation, which releases the GIL for large blocks.
 
     :param filename: file name (str)
     :return: checksum value (str).
     """
-    length = io.DEFAULT_BUFFER_SIZE
-    md5 = hashlib.md5()
+    with io.open(filename, mode="rb", buffering=0) as _fd:
+        if hasattr(hashlib, 'file_digest'):
+            return hashlib.file_digest(_fd, 'md5').hexdigest()
 
-    with io.open(filename, mode="rb") as _fd:
-        for chunk in iter(lambda: _fd.read(length), b''):
-            md5.update(chunk)
+        md5 = hashlib.md5()
+        buffer = bytearray(CHECKSUM_BLOCK_SIZE)
+        view = memoryview(buffer)
+        for nbytes in iter(partial(_fd.readinto, buffer), 0):
+            md5.update(view[:nbytes])
 
     return md5.hexdigest()
 
 
+class ChecksumReader:
+    """
+    Read-only file object wrapper that calculates the checksum of the data while it is being read.
+
+    Used by copytools that read the file themselves during the transfer (e.g. boto3 upload_fileobj()), to avoid
+    reading the file a second time only for the checksum calculation. Data that is read more than once (e.g. after
+    a seek back due to a retried transfer) is only hashed once. If the data is not read contiguously, the checksum
+    is considered invalid and get_checksum() returns an empty string.
+    """
+
+    def __init__(self, fileobj: IO, algorithm: str = "adler32"):
+        """
+        Initialize the wrapper.
+
+        :param fileobj: file object opened in binary mode (IO)
+        :param algorithm: checksum algorithm, adler32 or md5 (str)
+        :raises NotImplementedError: for unknown algorithms.
+        """
+        self._fileobj = fileobj
+        self._offset = 0  # number of bytes hashed so far
+        self._valid = True
+        self._adler = 1
+        self._md5 = None
+        if algorithm in {'md5', 'md5sum', 'md'}:
+            self._md5 = hashlib.md5()
+        elif algorithm not in {'adler32', 'adler', 'ad', 'ad32'}:
+            logger.warning(f'unknown checksum algorithm: {algorithm}')
+            raise NotImplementedError()
+
+    def read(self, size: int = -1) -> bytes:
+        """
+        Read from the underlying file object and update the checksum.
+
+        :param size: number of bytes to read (int)
+        :return: data (bytes).
+        """
+        position = self._fileobj.tell()
+        data = self._fileobj.read(size)
+        if data and self._valid:
+            end = position + len(data)
+            if position > self._offset:  # skipped data, the checksum can not be trusted
+                self._valid = False
+            elif end > self._offset:
+                block = memoryview(data)[self._offset - position:]
+                if self._md5:
+                    self._md5.update(block)
+                else:
+                    self._adler = adler32(block, self._adler)
+                self._offset = end
+
+        return data
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        """
+        Seek in the underlying file object.
+
+        :param offset: offset (int)
+        :param whence: reference position (int)
+        :return: new position (int).
+        """
+        return self._fileobj.seek(offset, whence)
+
+    def tell(self) -> int:
+        """
+        Return the current position of the underlying file object.
+
+        :return: position (int).
+        """
+        return self._fileobj.tell()
+
+    def get_checksum(self, filesize: int) -> str:
+        """
+        Return the checksum of the data read so far.
+
+        :param filesize: expected number of bytes, the checksum is only returned if all data has been read (int)
+        :return: checksum value, empty string if the checksum could not be calculated (str).
+        """
+        if not self._valid or self._offset != filesize:
+            return ""
+
+        if self._md5:
+            return self._md5.hexdigest()
+
+        return f"{self._adler & 0xffffffff:08x}"
+
+
 def get_checksum_value(checksum: str) -> str:
     """
     Return the actual checksum value from the full checksum string.
@@ -38,8 +38,9 @@ from pilot.util.filehandling import (
     write_json
 )
 
-lock = threading.Lock()
+_lock = threading.RLock()  # protects the read-modify-write of the heartbeat file
 logger = logging.getLogger(__name__)
+_heartbeat_cache = {'path': None, 'mtime': -1, 'size': -1, 'data': {}}  # last read/written heartbeat, keyed by file mtime
 # errors = ErrorCodes()
 
 
@@ -56,12 +57,12 @@ def update_pilot_heartbeat(update_time: float, detected_job_suspension: bool = F
     :param name: name of the heartbeat to update, 'pilot' or 'server' (str)
     :return: True if successfully updated heartbeat file, False otherwise (bool).
     """
-    path = os.path.join(os.getenv('PILOT_HOME', os.getcwd()), config.Pilot.pilot_heartbeat_file)
-    dictionary = read_pilot_heartbeat(path)
-    if not dictionary:  # redundancy
-        dictionary = {}
+    path = get_heartbeat_path()
+
+    # read, modify and write the file while holding the lock once, so that no other update can sneak in between
+    with _lock:
+        dictionary = _read_unlocked(path) or {}
 
-    with lock:
         # add the diff time (time between updates) to the dictionary if not present (ie the first time)
         if not dictionary.get('max_diff_time', None):
             # ie add the new field
@@ -79,12 +80,36 @@ def update_pilot_heartbeat(update_time: float, detected_job_suspension: bool = F
         else:
             logger.debug('no job suspension detected')
 
-        status = write_json(path, dictionary)
+        status = _write_atomically(path, dictionary)
         if not status:
             logger.warning(f'failed to update heartbeat file: {path}')
             return False
         else:
             logger.debug(f'updated pilot heartbeat file: {path}')
+            _update_cache(path, dictionary)
+
+    return True
+
+
+def _write_atomically(path: str, dictionary: dict) -> bool:
+    """
+    Write the heartbeat dictionary to a temporary file and move it into place.
+
+    A reader (or a restarted pilot) will therefore never see a partially written file.
+
+    :param path: path to heartbeat file (str)
+    :param dictionary: dictionary with pilot heartbeat info (dict)
+    :return: True if the file was written, False otherwise (bool).
+    """
+    tmp_path = path + '.tmp'
+    if not write_json(tmp_path, dictionary, indent=None, separators=(',', ':')):
+        return False
+
+    try:
+        os.replace(tmp_path, path)
+    except OSError as exc:
+        logger.warning(f'failed to move {tmp_path} to {path}: {exc}')
+        return False
 
     return True
 
@@ -96,18 +121,96 @@ def read_pilot_heartbeat(path: str) -> dict:
     :param path: path to heartbeat file (str)
     :return: dictionary with pilot heartbeat info (dict).
     """
-    dictionary = {}
+    with _lock:
+        return _read_unlocked(path)
 
-    with lock:
+
+def _read_unlocked(path: str) -> dict:
+    """
+    Read the pilot heartbeat file without taking the lock.
+
+    The caller is expected to hold the lock. The file is only parsed if it has changed since it was last read or
+    written, otherwise a copy of the cached dictionary is returned.
+
+    :param path: path to heartbeat file (str)
+    :return: dictionary with pilot heartbeat info (dict).
+    """
+    # no separate existence check, a missing file is detected by the stat itself
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return {}
+
+    if path == _heartbeat_cache['path'] and (stat.st_mtime_ns, stat.st_size) == (_heartbeat_cache['mtime'], _heartbeat_cache['size']):
+        return dict(_heartbeat_cache['data'])
+
+    dictionary = {}
+    try:
+        dictionary = read_json(path) or {}  # read_json() returns None for a corrupt file
+    except FileHandlingFailure as exc:
+        # the file may have been removed after the stat, which is not worth a warning
         if os.path.exists(path):
-            try:
-                dictionary = read_json(path)
-            except (PilotException, FileHandlingFailure, ConversionFailure) as exc:
-                logger.warning(f'failed to read heartbeat file: {exc}')
+            logger.warning(f'failed to read heartbeat file: {exc}')
+    except (PilotException, ConversionFailure) as exc:
+        logger.warning(f'failed to read heartbeat file: {exc}')
+    else:
+        if dictionary:
+            _set_cache(path, stat, dictionary)
 
     return dictionary
 
 
+def _update_cache(path: str, dictionary: dict):
+    """
+    Update the heartbeat cache after the heartbeat file has been written.
+
+    The caller is expected to hold the lock.
+
+    :param path: path to heartbeat file (str)
+    :param dictionary: dictionary with pilot heartbeat info that was written to the file (dict).
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        _heartbeat_cache['path'] = None
+    else:
+        _set_cache(path, stat, dictionary)
+
+
+def _set_cache(path: str, stat: os.stat_result, dictionary: dict):
+    """
+    Store a copy of the heartbeat dictionary together with the file mtime and size.
+
+    :param path: path to heartbeat file (str)
+    :param stat: stat result for the heartbeat file (os.stat_result)
+    :param dictionary: dictionary with pilot heartbeat info (dict).
+    """
+    _heartbeat_cache.update(path=path, mtime=stat.st_mtime_ns, size=stat.st_size, data=dict(dictionary))
+
+
+def get_heartbeat_path() -> str:
+    """
+    Return the full path to the pilot heartbeat file.
+
+    :return: path to heartbeat file (str).
+    """
+    return os.path.join(os.getenv('PILOT_HOME', os.getcwd()), config.Pilot.pilot_heartbeat_file)
+
+
+def _get_field(key: str, default: int = 0) -> int:
+    """
+    Return a single field from the heartbeat file.
+
+    The file is only parsed if it has changed since it was last read or written.
+
+    :param key: name of the field (str)
+    :param default: value to return if the field or the file is missing (int)
+    :return: field value (int).
+    """
+    with _lock:
+        return _read_unlocked(get_heartbeat_path()).get(key, default)
+
+
 def get_last_update(name: str = 'pilot') -> int:
     """
     Return the time of the last pilot or server update.
@@ -115,11 +218,7 @@ def get_last_update(name: str = 'pilot') -> int:
     :param name: name of the heartbeat to return (str)
     :return: time of last pilot or server update (int).
     """
-    dictionary = read_pilot_heartbeat()
-    if dictionary:
-        return dictionary.get(f'last_{name}_update', 0)
-
-    return 0
+    return _get_field(f'last_{name}_update')
 
 
 def time_since_suspension() -> int:
@@ -130,17 +229,13 @@ def time_since_suspension() -> int:
 
     :return: time since the pilot detected a job suspension (int).
     """
-    path = os.path.join(os.getenv('PILOT_HOME', os.getcwd()), config.Pilot.pilot_heartbeat_file)
-    dictionary = read_pilot_heartbeat(path)
-    if dictionary:
-        time_since_detection = dictionary.get('time_since_detection', 0)
-        if time_since_detection:
-            # reset the time since detection to zero
-            update_pilot_heartbeat(time.time(), False, 0)
-            logger.info('reset time since detection to zero')
-        return time_since_detection
+    time_since_detection = _get_field('time_since_detection')
+    if time_since_detection:
+        # reset the time since detection to zero
+        update_pilot_heartbeat(time.time(), False, 0)
+        logger.info('reset time since detection to zero')
 
-    return 0
+    return time_since_detection
 
 
 def is_suspended(limit: int = 10 * 60) -> bool:
@@ -150,10 +245,7 @@ def is_suspended(limit: int = 10 * 60) -> bool:
     :param limit: time limit in seconds (int)
     :return: True if the pilot is suspended, False otherwise (bool).
     """
-    last_pilot_update = get_last_update()
-    if last_pilot_update:
-        # check if more than ten minutes has passed
-        if int(time.time()) - last_pilot_update > limit:
-            return True
+    last_pilot_update = _get_field('last_pilot_update')
 
-    return False
+    # check if more than ten minutes has passed
+    return bool(last_pilot_update) and int(time.time()) - last_pilot_update > limit
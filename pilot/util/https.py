@@ -30,9 +30,14 @@ except ImportError:
 import json
 import logging
 import os
+try:
+    import orjson
+except ImportError:
+    orjson = None
 import pipes
 import platform
 import random
+import shutil
 try:
     import requests
 except ImportError:
@@ -44,6 +49,7 @@ import urllib.request
 import urllib.error
 import urllib.parse
 from collections import namedtuple
+from functools import lru_cache
 from gzip import GzipFile
 from io import BytesIO
 from re import findall
@@ -278,6 +284,65 @@ def request(url: str, data: dict = None, plain: bool = False, secure: bool = Tru
         return output.read() if plain else json.load(output)
 
 
+@lru_cache(maxsize=1)
+def get_session() -> Any:
+    """
+    Return the requests session shared by all callers of request_session().
+
+    The session keeps the connections to the server alive, so that successive requests do not each need a new
+    TCP connection and TLS handshake.
+
+    :return: session (requests.Session or None if the requests module is not available).
+    """
+    if not requests:
+        return None
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(max_retries=2)  # retries failed connection attempts only
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+    return session
+
+
+def request_session(url: str, data: dict = None) -> dict or None:
+    """
+    Send a request with form data using the shared requests session and return the JSON response.
+
+    The same certificates are used as by the curl based request(). Token based authentication is not supported,
+    in which case None is returned and the caller should fall back to request().
+
+    :param url: the URL of the resource (str)
+    :param data: data to send (dict)
+    :return: server response (dict or None if the request could not be sent or failed).
+    """
+    session = get_session()
+    if not session:
+        return None
+    if os.environ.get('OIDC_AUTH_TOKEN', os.environ.get('PANDA_AUTH_TOKEN', None)):
+        return None
+
+    # https might not have been set up if running in a [middleware] container
+    if not _ctx.cacert:
+        logger.debug('setting up unset https')
+        https_setup(None, get_pilot_version())
+    update_ctx()  # X509_USER_PROXY might change during running
+
+    headers = {
+        "Accept": "application/json",
+        "User-Agent": _ctx.user_agent,
+    }
+    try:
+        response = session.post(url, data=data or {}, headers=headers, cert=_ctx.cacert, verify=_ctx.capath or True,
+                                timeout=(config.Pilot.http_connect_timeout, config.Pilot.http_maxtime))
+        response.raise_for_status()
+        return response.json()
+    except (requests.exceptions.RequestException, ValueError) as exc:
+        logger.warning(f'failed to send request: {exc}')
+
+    return None
+
+
 def update_ctx():
     """Update the ctx object in case X509_USER_PROXY has been updated."""
     x509 = os.environ.get('X509_USER_PROXY', _ctx.cacert)
@@ -376,7 +441,7 @@ def get_vars(url: str, data: dict) -> (str, str):
     strdata = ""
     for key in data:
         strdata += f'data="{urllib.parse.urlencode({key: data[key]})}"\n'
-    jobid = f"_{data['jobId']}" if 'jobId' in list(data.keys()) else ""
+    jobid = f"_{data['jobId']}" if 'jobId' in data else ""
 
     # write data to temporary config file
     filename = f"{os.getenv('PILOT_HOME')}/curl_{os.path.basename(url)}{jobid}.config"
@@ -660,6 +725,40 @@ def get_server_command(url: str, port: str, cmd: str = 'getJob') -> str:
     return f'{url}/server/panda/{cmd}'
 
 
+def json_dumps_bytes(data: Any) -> bytes:
+    """
+    Serialize the given data to UTF-8 encoded JSON.
+
+    orjson is used if available, since it is much faster than the json module for large payloads (e.g. job reports)
+    and produces bytes directly. The json module is used for data that orjson cannot serialize.
+
+    :param data: data to serialize (Any)
+    :return: JSON (bytes).
+    """
+    if orjson:
+        try:
+            return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError as exc:  # orjson.JSONEncodeError is a TypeError
+            logger.debug(f'orjson failed to serialize data, using json instead: {exc}')
+
+    return json.dumps(data).encode('utf-8')
+
+
+def json_dumps(data: Any) -> str:
+    """
+    Serialize the given data to a JSON string.
+
+    Same as json_dumps_bytes(), for callers that need a string (e.g. JSON embedded in form data).
+
+    :param data: data to serialize (Any)
+    :return: JSON (str).
+    """
+    if orjson:
+        return json_dumps_bytes(data).decode('utf-8')
+
+    return json.dumps(data)
+
+
 def request2(url: str = "", data: dict = None, secure: bool = True, compressed: bool = True) -> str or dict:
     """
     Send a request using HTTPS (using urllib module).
@@ -690,10 +789,10 @@ def request2(url: str = "", data: dict = None, secure: bool = True, compressed:
     if compressed:
         rdata_out = BytesIO()
         with GzipFile(fileobj=rdata_out, mode="w") as f_gzip:
-            f_gzip.write(json.dumps(data).encode())
+            f_gzip.write(json_dumps_bytes(data))
         data_json = rdata_out.getvalue()
     else:
-        data_json = json.dumps(data).encode('utf-8')
+        data_json = json_dumps_bytes(data)
         #data_json = urllib.parse.quote(json.dumps(data))
         #data_json = data_json.encode('utf-8')
         #data_json = urllib.parse.urlencode(data).encode()
@@ -786,8 +885,8 @@ def request3(url: str, data: dict = None) -> str:
         "User-Agent": _ctx.user_agent,
     }
 
-    # Convert the dictionary to a JSON string
-    data_json = json.dumps(data)
+    # Convert the dictionary to JSON
+    data_json = json_dumps_bytes(data)
 
     # Use the requests module to make the HTTP request
     try:
@@ -869,3 +968,30 @@ def download_file(url: str, _timeout: int = 20) -> str:
         content = ""
 
     return content
+
+
+def download_file_to(url: str, fileobj: Any, _timeout: int = 20, chunk_size: int = 65536) -> (int, int):
+    """
+    Download url content and write it to the given file object in chunks.
+
+    Unlike download_file(), the content is never held in memory as a whole.
+
+    :param url: url (str)
+    :param fileobj: file object opened in binary write mode (Any)
+    :param _timeout: timeout in seconds (int)
+    :param chunk_size: size of the chunks that are copied, in bytes (int)
+    :return: number of bytes written, 0 in case of failure (int), HTTP error code, 0 if none (int).
+    """
+    req = urllib.request.Request(url)
+    req.add_header('User-Agent', ctx.user_agent)
+    try:
+        with urllib.request.urlopen(req, context=ctx.ssl_context, timeout=_timeout) as response:
+            shutil.copyfileobj(response, fileobj, chunk_size)
+    except urllib.error.HTTPError as exc:
+        logger.warning(f"error occurred with urlopen: {exc.code} {exc.reason}")
+        return 0, exc.code
+    except (urllib.error.URLError, OSError) as exc:
+        logger.warning(f"error occurred with urlopen: {getattr(exc, 'reason', exc)}")
+        return 0, 0
+
+    return fileobj.tell(), 0
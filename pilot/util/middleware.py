@@ -439,4 +439,4 @@ def use_middleware_script(container_type):
     :return: Boolean (True if middleware should be containerised).
     """
 
-    return True if container_type == 'container' or container_type == 'bash' else False
+    return container_type in ('container', 'bash')
@@ -32,10 +32,7 @@ logger = logging.getLogger(__name__)
 
 
 def interrupt(args, signum, frame):
-    try:
-        logger.info('caught signal: %s' % [v for v, k in signal.__dict__.iteritems() if k == signum][0])
-    except Exception:
-        logger.info('caught signal: %s' % [v for v, k in list(signal.__dict__.items()) if k == signum][0])
+    logger.info('caught signal: %s', signal.Signals(signum).name)
     args.graceful_stop.set()
 
 
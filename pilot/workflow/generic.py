@@ -58,10 +58,7 @@ def interrupt(args, signum, frame):
     :param frame: stack/execution frame pointing to the frame that was interrupted by the signal.
     """
 
-    try:
-        sig = [v for v, k in signal.__dict__.iteritems() if k == signum][0]
-    except Exception:
-        sig = [v for v, k in list(signal.__dict__.items()) if k == signum][0]
+    sig = signal.Signals(signum).name  # e.g. 'SIGTERM'
 
     # ignore SIGUSR1 since that will be aimed at a child process
     #if str(sig) == 'SIGUSR1':
@@ -71,11 +68,12 @@ def interrupt(args, signum, frame):
     args.signal_counter += 1
 
     # keep track of when first kill signal arrived, any stuck loops should abort at a defined cut off time
+    now = time()
+    current_time = int(now)
     if args.kill_time == 0:
-        args.kill_time = int(time())
+        args.kill_time = current_time
 
     max_kill_wait_time = MAX_KILL_WAIT_TIME + 60  # add another minute of grace to let threads finish
-    current_time = int(time())
     if args.kill_time and current_time - args.kill_time > max_kill_wait_time:
         logger.warning('passed maximum waiting time after first kill signal - will commit suicide - farewell')
         try:
@@ -85,8 +83,8 @@ def interrupt(args, signum, frame):
         logging.shutdown()
         kill_processes(getpid())
 
-    add_to_pilot_timing('0', PILOT_KILL_SIGNAL, time(), args)
-    add_to_pilot_timing('1', PILOT_KILL_SIGNAL, time(), args)
+    add_to_pilot_timing('0', PILOT_KILL_SIGNAL, now, args)
+    add_to_pilot_timing('1', PILOT_KILL_SIGNAL, now, args)
     logger.warning('caught signal: %s in FRAME=\n%s', sig, '\n'.join(traceback.format_stack(frame)))
 
     args.signal = sig
@@ -107,8 +105,9 @@ def register_signals(signals, args):
     :return:
     """
 
+    handler = functools.partial(interrupt, args)
     for sig in signals:
-        signal.signal(sig, functools.partial(interrupt, args))
+        signal.signal(sig, handler)
 
 
 def run(args):
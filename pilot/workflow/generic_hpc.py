@@ -59,10 +59,7 @@ def interrupt(args, signum, frame):
     :return:
     """
 
-    try:
-        logger.info('caught signal: %s', [v for v, k in signal.__dict__.iteritems() if k == signum][0])  # Python 2
-    except Exception:
-        logger.info('caught signal: %s', [v for v, k in list(signal.__dict__.items()) if k == signum][0])  # Python 3
+    logger.info('caught signal: %s', signal.Signals(signum).name)
 
     args.graceful_stop.set()
 
@@ -262,7 +259,7 @@ def declare_output(job, work_report, worker_stageout_declaration):
                 file_desc['filetype'] = 'output'
             file_desc['path'] = os.path.abspath(outfile)
             file_desc['fsize'] = os.path.getsize(outfile)
-            if 'guid' in list(job.output_files[outfile].keys()):  # Python 2/3
+            if 'guid' in job.output_files[outfile]:
                 file_desc['guid'] = job.output_files[outfile]['guid']
             elif work_report['outputfiles'] and work_report['outputfiles'][outfile]:
                 file_desc['guid'] = work_report['outputfiles'][outfile]['guid']
@@ -19,8 +19,6 @@
 # Authors:
 # - Paul Nilsson, paul.nilsson@cern.ch, 2019-23
 
-from __future__ import print_function  # Python 2, 2to3 complains about this
-
 import functools
 import signal
 import threading
@@ -28,7 +26,6 @@ import traceback
 import queue
 from os import getpid
 from time import time
-from sys import stderr
 from collections import namedtuple
 from shutil import rmtree
 
@@ -41,6 +38,20 @@ from pilot.util.timing import add_to_pilot_timing
 import logging
 logger = logging.getLogger(__name__)
 
+QUEUE_NAMES = ('jobs', 'data_in', 'data_out', 'current_data_in', 'validated_jobs', 'monitored_payloads',
+               'finished_jobs', 'finished_data_in', 'finished_data_out', 'completed_jobids',
+               'failed_jobs', 'failed_data_in', 'failed_data_out', 'completed_jobs')  # internal queues of the stager workflow
+TRAPPED_SIGNALS = (signal.SIGINT, signal.SIGTERM, signal.SIGQUIT, signal.SIGSEGV, signal.SIGXCPU, signal.SIGUSR1,
+                   signal.SIGBUS)  # signals that are forwarded to interrupt()
+MAX_FRAME_DEPTH = 8  # number of frames listed for an interrupted frame, unless in debug mode
+
+
+class Queues:
+    """Container for the internal queues of the stager workflow."""
+
+    __slots__ = QUEUE_NAMES
+    _fields = QUEUE_NAMES  # like a namedtuple, since the queue handling functions loop over the queues by name
+
 
 def interrupt(args, signum, frame):
     """
@@ -54,35 +65,87 @@ def interrupt(args, signum, frame):
     :return:
     """
 
-    sig = [v for v, k in list(signal.__dict__.items()) if k == signum][0]
+    sig = signal.Signals(signum).name  # e.g. 'SIGTERM'
     args.signal_counter += 1
 
     # keep track of when first kill signal arrived, any stuck loops should abort at a defined cut off time
+    now = time()
+    current_time = int(now)
     if args.kill_time == 0:
-        args.kill_time = int(time())
+        args.kill_time = current_time
 
     max_kill_wait_time = MAX_KILL_WAIT_TIME + 60  # add another minute of grace to let threads finish
-    current_time = int(time())
     if args.kill_time and current_time - args.kill_time > max_kill_wait_time:
         logger.warning('passed maximum waiting time after first kill signal - will commit suicide - farewell')
-        try:
-            rmtree(args.sourcedir)
-        except Exception as e:
-            logger.warning(e)
-        logging.shutdown()
-        kill_processes(getpid())
+        commit_suicide(args)
+        return  # nothing else to do (the logging has been shut down)
 
-    add_to_pilot_timing('0', PILOT_KILL_SIGNAL, time(), args)
-    add_to_pilot_timing('1', PILOT_KILL_SIGNAL, time(), args)
-    logger.warning('caught signal: %s in FRAME=\n%s', sig, '\n'.join(traceback.format_stack(frame)))
+    add_to_pilot_timing('0', PILOT_KILL_SIGNAL, now, args)
+    add_to_pilot_timing('1', PILOT_KILL_SIGNAL, now, args)
+    logger.warning('caught signal: %s in FRAME=\n%s\n'
+                   'will instruct threads to abort and update the server, set graceful stop (in case it was not set '
+                   'already) and wait for threads to finish', sig, format_frame(frame))
 
     args.signal = sig
-    logger.warning('will instruct threads to abort and update the server')
     args.abort_job.set()
-    logger.warning('setting graceful stop (in case it was not set already)')
     args.graceful_stop.set()
-    logger.warning('waiting for threads to finish')
-    args.job_aborted.wait()
+    if not args.job_aborted.wait(timeout=max_kill_wait_time):
+        logger.warning(f'threads did not finish within {max_kill_wait_time} s - will commit suicide - farewell')
+        commit_suicide(args)
+
+
+def commit_suicide(args):
+    """
+    Remove the pilot source directory and kill the pilot process (and its children).
+
+    :param args: pilot arguments.
+    """
+
+    try:
+        rmtree(args.sourcedir)
+    except Exception as e:
+        logger.warning(e)
+    logging.shutdown()
+    kill_processes(getpid())
+
+
+def format_frame(frame, depth=MAX_FRAME_DEPTH):
+    """
+    Return a description of the stack at the given frame.
+
+    The full stack trace, including the source lines, is only formatted in debug mode. Otherwise only the file name
+    and line number of the innermost frames are listed, which does not require reading any source files.
+
+    :param frame: stack/execution frame (frame).
+    :param depth: maximum number of frames to list when not in debug mode (int).
+    :return: stack description (string).
+    """
+
+    if logger.isEnabledFor(logging.DEBUG):
+        return '\n'.join(traceback.format_stack(frame))
+
+    lines = []
+    while frame is not None and len(lines) < depth:
+        lines.append(f'{frame.f_code.co_filename}:{frame.f_lineno} in {frame.f_code.co_name}')
+        frame = frame.f_back
+
+    return '\n'.join(lines)
+
+
+def drain_bucket(bucket):
+    """
+    Remove and return everything that is currently in the given bucket.
+
+    :param bucket: thread bucket (queue).
+    :return: list of items (list).
+    """
+
+    items = []
+    while True:
+        try:
+            items.append(bucket.get_nowait())
+        except queue.Empty:
+            return items
 
 
 def run(args):
@@ -96,37 +159,14 @@ def run(args):
     """
 
     logger.info('setting up signal handling')
-    signal.signal(signal.SIGINT, functools.partial(interrupt, args))
-    signal.signal(signal.SIGTERM, functools.partial(interrupt, args))
-    signal.signal(signal.SIGQUIT, functools.partial(interrupt, args))
-    signal.signal(signal.SIGSEGV, functools.partial(interrupt, args))
-    signal.signal(signal.SIGXCPU, functools.partial(interrupt, args))
-    signal.signal(signal.SIGUSR1, functools.partial(interrupt, args))
-    signal.signal(signal.SIGBUS, functools.partial(interrupt, args))
+    handler = functools.partial(interrupt, args)
+    for sig in TRAPPED_SIGNALS:
+        signal.signal(sig, handler)
 
     logger.info('setting up queues')
-    queues = namedtuple('queues', ['jobs', 'data_in', 'data_out', 'current_data_in', 'validated_jobs', 'monitored_payloads',
-                                   'finished_jobs', 'finished_data_in', 'finished_data_out', 'completed_jobids',
-                                   'failed_jobs', 'failed_data_in', 'failed_data_out', 'completed_jobs'])
-
-    queues.jobs = queue.Queue()
-    queues.data_in = queue.Queue()
-    queues.data_out = queue.Queue()
-
-    queues.current_data_in = queue.Queue()
-    queues.validated_jobs = queue.Queue()
-    queues.monitored_payloads = queue.Queue()
-
-    queues.finished_jobs = queue.Queue()
-    queues.finished_data_in = queue.Queue()
-    queues.finished_data_out = queue.Queue()
-
-    queues.failed_jobs = queue.Queue()
-    queues.failed_data_in = queue.Queue()
-    queues.failed_data_out = queue.Queue()
-
-    queues.completed_jobs = queue.Queue()
-    queues.completed_jobids = queue.Queue()
+    queues = Queues()
+    for name in QUEUE_NAMES:
+        setattr(queues, name, queue.Queue())
 
     logger.info('setting up tracing')
     traces = namedtuple('traces', ['pilot'])
@@ -137,37 +177,31 @@ def run(args):
 
     # define the threads
     targets = {'job': job.control, 'data': data.control, 'monitor': monitor.control}
-    threads = [ExcThread(bucket=queue.Queue(), target=target, kwargs={'queues': queues, 'traces': traces, 'args': args},
-                         name=name) for name, target in list(targets.items())]
+    bucket = queue.SimpleQueue()  # shared by all threads, so that the exceptions can be collected in one go
+    thread_event = threading.Event()  # set by the threads when they have placed an exception in the bucket or finished
+    threads = [ExcThread(bucket=bucket, target=target, kwargs={'queues': queues, 'traces': traces, 'args': args},
+                         name=name, event=thread_event) for name, target in targets.items()]
 
     logger.info('starting threads')
-    [thread.start() for thread in threads]
+    for thread in threads:
+        thread.start()
 
     logger.info('waiting for interrupts')
 
-    thread_count = threading.activeCount()
     try:
-        while threading.activeCount() > 1:
-            for thread in threads:
-                bucket = thread.get_bucket()
-                try:
-                    exc = bucket.get(block=False)
-                except queue.Empty:
-                    pass
-                else:
-                    exc_type, exc_obj, exc_trace = exc
-                    # deal with the exception
-                    print('received exception from bucket queue in generic workflow: %s' % exc_obj, file=stderr)
-
-                thread.join(0.1)
-
-            abort = False
-            if thread_count != threading.activeCount():
-                # has all threads finished?
-                #abort = threads_aborted(abort_at=1)
-                abort = threads_aborted(caller='run')
-                if abort:
-                    break
+        while True:
+            # wait for news from the threads instead of polling them
+            thread_event.wait(timeout=1)
+            thread_event.clear()
+            # check before draining, so that an exception put by a thread just before it finished is not missed
+            finished = not any(thread.is_alive() for thread in threads)
+            for exc in drain_bucket(bucket):
+                # deal with the exception
+                logger.error('received exception from bucket queue in stager workflow: %s', exc[1], exc_info=exc)
+
+            # once the stager threads have finished, make sure that any threads they started have finished as well
+            if finished and threads_aborted(caller='run'):
+                break
     except Exception as exc:
         logger.warning(f"exception caught while handling threads: {exc}")
     finally: